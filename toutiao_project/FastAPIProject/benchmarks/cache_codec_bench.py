@@ -0,0 +1,89 @@
+"""
+缓存编解码基准：对比各序列化/压缩组合的存储字节数与编解码耗时
+
+运行(在 FastAPIProject 目录下)：
+    python -m benchmarks.cache_codec_bench
+    python -m benchmarks.cache_codec_bench --sizes 10 50 100 --content-chars 3000 --json result.json
+"""
+import argparse
+import json
+import random
+import time
+
+from config import cache_codec
+
+
+def make_news_list(size: int, content_chars: int):
+    """
+    构造和新闻列表缓存结构一致的数据，content 使用中文文本
+    """
+    words = ["新闻", "科技", "经济", "体育", "娱乐", "国际", "发布", "记者", "报道", "今日"]
+    return [{
+        "id": i,
+        "title": f"第{i}条新闻标题" + "".join(random.choices(words, k=8)),
+        "description": "".join(random.choices(words, k=40)),
+        "content": "".join(random.choices(words, k=content_chars // 2)),
+        "image": f"https://example.com/images/{i}.jpg",
+        "author": "记者",
+        "category_id": 1,
+        "views": random.randint(0, 100000),
+        "publish_time": "2024-01-01T08:00:00",
+    } for i in range(size)]
+
+
+def legacy_encode(value):
+    return json.dumps(value, ensure_ascii=False).encode()
+
+
+def measure(fn, arg, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn(arg)
+    return result, (time.perf_counter() - start) / repeat * 1e6
+
+
+def run(sizes, content_chars: int, repeat: int):
+    results = []
+    for size in sizes:
+        payload = make_news_list(size, content_chars)
+        cases = [("legacy-json", legacy_encode, json.loads)]
+        for codec in cache_codec.SERIALIZERS:
+            for compression in cache_codec.COMPRESSORS:
+                cases.append((
+                    f"{codec}+{compression}",
+                    lambda value, c=codec, z=compression: cache_codec.encode(value, c, z, threshold=0),
+                    cache_codec.decode,
+                ))
+        for name, encode, decode in cases:
+            data, encode_us = measure(encode, payload, repeat)
+            _, decode_us = measure(decode, data, repeat)
+            results.append({
+                "items": size,
+                "codec": name,
+                "bytes": len(data),
+                "encode_us": round(encode_us, 1),
+                "decode_us": round(decode_us, 1),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="缓存编解码基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--content-chars", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--json", dest="json_path", help="把结果保存为 JSON 文件")
+    args = parser.parse_args()
+
+    random.seed(0)
+    results = run(args.sizes, args.content_chars, args.repeat)
+    print(f"{'items':>5}  {'codec':<16}{'bytes':>10}{'encode(us)':>12}{'decode(us)':>12}")
+    for row in results:
+        print(f"{row['items']:>5}  {row['codec']:<16}{row['bytes']:>10}{row['encode_us']:>12}{row['decode_us']:>12}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
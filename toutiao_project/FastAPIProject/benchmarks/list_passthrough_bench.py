@@ -0,0 +1,110 @@
+"""
+新闻列表响应基准：对比缓存命中后两种生成响应体的方式
+- orm：解码缓存 -> News(**item) -> jsonable_encoder -> JSONResponse，旧的做法
+- passthrough：缓存值还原成 JSON 字节后直接拼进响应体
+
+运行(在 FastAPIProject 目录下)：
+    python -m benchmarks.list_passthrough_bench
+    python -m benchmarks.list_passthrough_bench --sizes 10 50 100 --repeat 500 --json result.json
+"""
+import argparse
+import json
+import random
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from config import cache_codec
+from models.news import News
+from utils.pagination import encode_cursor
+from utils.response import raw_success_response
+
+
+def make_news_page(size: int):
+    """
+    构造和列表页缓存结构一致的数据(只有卡片字段，没有 content)
+    """
+    words = ["新闻", "科技", "经济", "体育", "娱乐", "国际", "发布", "记者", "报道", "今日"]
+    items = [{
+        "id": i,
+        "title": f"第{i}条新闻标题" + "".join(random.choices(words, k=8)),
+        "description": "".join(random.choices(words, k=40)),
+        "image": f"https://example.com/images/{i}.jpg",
+        "author": "记者",
+        "category_id": 1,
+        "views": random.randint(0, 100000),
+        "publish_time": "2024-01-01T08:00:00",
+    } for i in range(size)]
+    return {"list": items, "hasMore": True, "nextCursor": encode_cursor(items[-1]["publish_time"], items[-1]["id"])}
+
+
+def orm_response(data: bytes, total: int):
+    page = cache_codec.decode(data)
+    news_list = [News(**item) for item in page["list"]]
+    content = {
+        "code": 200,
+        "message": "获取新闻列表成功",
+        "data": {
+            "list": news_list,
+            "total": total,
+            "hasMore": page["hasMore"],
+            "nextCursor": page["nextCursor"],
+        }
+    }
+    return JSONResponse(content=jsonable_encoder(content)).body
+
+
+def passthrough_response(data: bytes, total: int):
+    return raw_success_response("获取新闻列表成功", cache_codec.to_json_bytes(data), total=total).body
+
+
+def measure(fn, data: bytes, repeat: int):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = fn(data, 1000)
+    return body, (time.perf_counter() - start) / repeat * 1e6
+
+
+def run(sizes, repeat: int):
+    results = []
+    for size in sizes:
+        data = cache_codec.encode(make_news_page(size))
+        baseline = None
+        for name, fn in [("orm", orm_response), ("passthrough", passthrough_response)]:
+            body, us = measure(fn, data, repeat)
+            # 两种方式的响应体必须解析出相同的内容
+            parsed = json.loads(body)
+            parsed["data"]["list"] = [dict(sorted(item.items())) for item in parsed["data"]["list"]]
+            if baseline is None:
+                baseline = parsed
+            assert parsed == baseline, name
+            results.append({
+                "items": size,
+                "mode": name,
+                "bytes": len(body),
+                "us": round(us, 1),
+                "rps_per_core": round(1e6 / us),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="新闻列表响应基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--repeat", type=int, default=300)
+    parser.add_argument("--json", dest="json_path", help="把结果保存为 JSON 文件")
+    args = parser.parse_args()
+
+    random.seed(0)
+    results = run(args.sizes, args.repeat)
+    print(f"{'items':>5}  {'mode':<12}{'bytes':>10}{'us':>12}{'rps/core':>12}")
+    for row in results:
+        print(f"{row['items']:>5}  {row['mode']:<12}{row['bytes']:>10}{row['us']:>12}{row['rps_per_core']:>12}")
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
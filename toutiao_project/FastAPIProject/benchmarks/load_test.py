@@ -0,0 +1,245 @@
+"""
+新闻接口压测：在本地 sqlite(aiosqlite) + fakeredis 上启动应用，灌入模拟数据后并发请求各接口
+统计每个场景的吞吐量和 p50/p95/p99 延迟，结果可保存为 JSON，用来对比不同提交的性能
+
+依赖(只在压测时需要)：aiosqlite、fakeredis(+lupa，执行 Lua 脚本)、httpx
+运行(在 FastAPIProject 目录下)：
+    python -m benchmarks.load_test
+    python -m benchmarks.load_test --concurrency 50 --requests 2000 --scenarios list detail --json result.json
+    python -m benchmarks.load_test --redis real      # 使用 config/cache_config 中配置的本地 Redis
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SEED = 0
+
+
+def configure(db_path: str, redis_mode: str):
+    """
+    必须在导入应用模块之前调用：数据库指向本地 sqlite，Redis 客户端换成 fakeredis
+    其他模块通过 from config.cache_config import redis_client 取客户端，所以要先替换再导入 main
+    """
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_path}"
+    os.environ["DB_ECHO"] = "false"
+    if redis_mode == "fake":
+        import fakeredis
+        from config import cache_config
+
+        server = fakeredis.FakeServer()
+        cache_config.redis_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        cache_config.redis_binary_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=False)
+
+    from sqlalchemy import event
+    from config.db_conf import async_engine
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def _sqlite_pragmas(dbapi_connection, connection_record):
+        # WAL + busy_timeout：并发写入时等待锁而不是直接报 database is locked
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+
+async def seed(args):
+    """
+    建表并灌入分类、新闻、用户(含令牌)、浏览历史和收藏，返回压测需要的 id 和 token
+    """
+    from config.db_conf import async_engine, AsyncSessionLocal
+    from models import news as news_models, users as users_models, history as history_models, \
+        favorite as favorite_models
+
+    async with async_engine.begin() as conn:
+        for module in (news_models, users_models, history_models, favorite_models):
+            await conn.run_sync(module.Base.metadata.create_all)
+
+    rng = random.Random(SEED)
+    now = datetime.now()
+    async with AsyncSessionLocal() as session:
+        categories = [news_models.Category(id=i, name=f"分类{i}", sort_order=i)
+                      for i in range(1, args.categories + 1)]
+        session.add_all(categories)
+        await session.flush()
+        news_rows = []
+        for i in range(1, args.news + 1):
+            news_rows.append({
+                "id": i,
+                "title": f"新闻标题{i}",
+                "description": "新闻摘要" * 10,
+                "content": "新闻正文" * (args.content_chars // 4),
+                "image": f"https://example.com/images/{i}.jpg",
+                "author": "记者",
+                "category_id": rng.randint(1, args.categories),
+                "views": rng.randint(0, 100000),
+                "publish_time": now - timedelta(minutes=i),
+            })
+        await session.execute(news_models.News.__table__.insert(), news_rows)
+
+        tokens = []
+        for i in range(1, args.users + 1):
+            session.add(users_models.User(id=i, username=f"user{i}", password="x", nickname=f"用户{i}"))
+            token = f"bench-token-{i}"
+            session.add(users_models.UserToken(user_id=i, token=token, expires_at=now + timedelta(days=7)))
+            tokens.append(token)
+        await session.flush()
+
+        history_rows = []
+        favorite_rows = []
+        for user_id in range(1, args.users + 1):
+            for news_id in rng.sample(range(1, args.news + 1), min(args.per_user, args.news)):
+                history_rows.append({"user_id": user_id, "news_id": news_id,
+                                     "view_time": now - timedelta(seconds=rng.randint(0, 86400))})
+            for news_id in rng.sample(range(1, args.news + 1), min(args.per_user, args.news)):
+                favorite_rows.append({"user_id": user_id, "news_id": news_id,
+                                      "created_at": now - timedelta(seconds=rng.randint(0, 86400))})
+        await session.execute(history_models.History.__table__.insert(), history_rows)
+        await session.execute(favorite_models.Favorite.__table__.insert(), favorite_rows)
+        await session.commit()
+    return tokens
+
+
+def scenarios(args, tokens):
+    """
+    场景名 -> 生成一次请求参数的函数，返回 (method, url, kwargs)
+    """
+    def auth():
+        return {"Authorization": f"Bearer {random.choice(tokens)}"}
+
+    def news_id():
+        return random.randint(1, args.news)
+
+    def hot_page():
+        # 大部分流量集中在前几页
+        return min(int(random.expovariate(0.7)) + 1, 20)
+
+    return {
+        "list": lambda: ("GET", "/api/news/list",
+                         {"params": {"categoryId": random.randint(1, args.categories), "page": hot_page(),
+                                     "pageSize": 10}}),
+        "detail": lambda: ("GET", "/api/news/detail", {"params": {"id": news_id()}}),
+        "history_add": lambda: ("POST", "/api/history/add", {"json": {"newsId": news_id()}, "headers": auth()}),
+        "history_list": lambda: ("GET", "/api/history/list", {"params": {"pageSize": 10}, "headers": auth()}),
+        "favorite_check": lambda: ("GET", "/api/favorite/check/batch",
+                                   {"params": {"newsIds": [news_id() for _ in range(10)]}, "headers": auth()}),
+        "favorite_list": lambda: ("GET", "/api/favorite/list", {"params": {"pageSize": 10}, "headers": auth()}),
+        "favorite_add": lambda: ("POST", "/api/favorite/add", {"json": {"newsId": news_id()}, "headers": auth()}),
+    }
+
+
+def percentile(sorted_values, q: float):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, name: str, make_request, total: int, concurrency: int):
+    latencies = []
+    statuses = {}
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in counter:
+            method, url, kwargs = make_request()
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            except Exception as e:
+                errors += 1
+                print(name, e)
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": total,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50), 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95), 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99), 2) if latencies else None,
+        "max_ms": round(latencies[-1], 2) if latencies else None,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "errors": errors,
+    }
+
+
+async def run(args):
+    from httpx import AsyncClient, ASGITransport
+    import main
+
+    tokens = await seed(args)
+    random.seed(SEED)
+    all_scenarios = scenarios(args, tokens)
+    names = args.scenarios or list(all_scenarios)
+    results = []
+    async with main.app.router.lifespan_context(main.app):
+        async with AsyncClient(transport=ASGITransport(app=main.app), base_url="http://bench") as client:
+            for name in names:
+                if args.warmup:
+                    await run_scenario(client, name, all_scenarios[name], args.warmup, args.concurrency)
+                results.append(await run_scenario(client, name, all_scenarios[name], args.requests, args.concurrency))
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="新闻接口压测")
+    parser.add_argument("--scenarios", nargs="+", help="只运行这些场景，默认全部")
+    parser.add_argument("--requests", type=int, default=1000, help="每个场景的请求数")
+    parser.add_argument("--warmup", type=int, default=100, help="每个场景正式计时前的预热请求数")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--news", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--per-user", type=int, default=50, help="每个用户的浏览历史/收藏条数")
+    parser.add_argument("--content-chars", type=int, default=2000)
+    parser.add_argument("--redis", choices=["fake", "real"], default="fake")
+    parser.add_argument("--json", dest="json_path", help="把结果保存为 JSON 文件")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure(os.path.join(tmp, "bench.db"), args.redis)
+        results = asyncio.run(run(args))
+
+    print(f"{'scenario':<16}{'rps':>10}{'p50(ms)':>10}{'p95(ms)':>10}{'p99(ms)':>10}  statuses")
+    for row in results:
+        print(f"{row['scenario']:<16}{row['rps']:>10}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}  "
+              f"{row['statuses']}")
+    if args.json_path:
+        report = {
+            "revision": git_revision(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "args": vars(args),
+            "results": results,
+        }
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+from typing import Dict, Iterable, List, Optional
+
+from config.cache_config import redis_client
+
+FAVORITE_SET_PREFIX = "favorite:user:"
+FAVORITE_SET_EXPIRE = 86400
+# 写入版本：每次增删(不论集合是否已加载)都加一，加载前后版本不一致说明期间有写入，放弃这次加载
+FAVORITE_VERSION_PREFIX = "favorite:ver:"
+# 占位成员：集合为空时也能和"未加载"区分开；不是数字，不会和新闻ID混淆，读取全部成员时要过滤掉
+_PLACEHOLDER = "__empty__"
+
+
+def favorite_set_key(user_id:int):
+    return f"{FAVORITE_SET_PREFIX}{user_id}"
+
+def favorite_version_key(user_id:int):
+    return f"{FAVORITE_VERSION_PREFIX}{user_id}"
+
+async def check_cached_favorites(user_id:int,news_ids:List[int]) -> Optional[Dict[int,bool]]:
+    """
+    批量判断是否收藏，集合尚未加载(或 Redis 不可用)时返回 None
+    """
+    key = favorite_set_key(user_id)
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.exists(key)
+            pipe.smismember(key,[str(news_id) for news_id in news_ids])
+            exists, flags = await pipe.execute()
+        if not exists:
+            return None
+        return {news_id:bool(flag) for news_id,flag in zip(news_ids,flags)}
+    except Exception as e:
+        print(e)
+        return None
+
+async def get_favorite_version(user_id:int) -> Optional[str]:
+    """
+    加载前读取写入版本，交给 load_cached_favorites 校验；Redis 不可用时返回 None，不做加载
+    """
+    try:
+        return await redis_client.get(favorite_version_key(user_id)) or "0"
+    except Exception as e:
+        print(e)
+        return None
+
+
+# 加载前后写入版本一致才写入集合，否则读取数据库期间有新的增删，快照可能已经过时
+# KEYS[1] 集合 KEYS[2] 写入版本；ARGV[1] 加载前的版本 ARGV[2] 过期时间 ARGV[3...] 成员
+_LOAD_FAVORITES_SCRIPT = """
+if (redis.call('get', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('del', KEYS[1])
+for i = 3, #ARGV, 500 do
+    redis.call('sadd', KEYS[1], unpack(ARGV, i, math.min(i + 499, #ARGV)))
+end
+redis.call('expire', KEYS[1], ARGV[2])
+return 1
+"""
+
+async def load_cached_favorites(user_id:int,version:str,news_ids:Iterable[int],expire:int=FAVORITE_SET_EXPIRE):
+    """
+    用数据库中的全部收藏初始化集合，version 为读取数据库之前的写入版本
+    """
+    try:
+        return await redis_client.eval(_LOAD_FAVORITES_SCRIPT,2,favorite_set_key(user_id),
+                                       favorite_version_key(user_id),version,expire,_PLACEHOLDER,
+                                       *[str(news_id) for news_id in news_ids])
+    except Exception as e:
+        print(e)
+
+
+# 先加写入版本(让进行中的加载失效)，集合已加载时再增删成员，未加载时保持不存在，下次读取再整体加载
+# KEYS[1] 集合 KEYS[2] 写入版本；ARGV[1] 命令 ARGV[2] 成员 ARGV[3] 过期时间
+_UPDATE_IF_EXISTS_SCRIPT = """
+redis.call('incr', KEYS[2])
+redis.call('expire', KEYS[2], ARGV[3])
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call(ARGV[1], KEYS[1], ARGV[2])
+end
+return nil
+"""
+
+async def add_cached_favorite(user_id:int,news_id:int,expire:int=FAVORITE_SET_EXPIRE):
+    try:
+        await redis_client.eval(_UPDATE_IF_EXISTS_SCRIPT,2,favorite_set_key(user_id),favorite_version_key(user_id),
+                                "sadd",str(news_id),expire)
+    except Exception as e:
+        print(e)
+
+async def remove_cached_favorite(user_id:int,news_id:int,expire:int=FAVORITE_SET_EXPIRE):
+    try:
+        await redis_client.eval(_UPDATE_IF_EXISTS_SCRIPT,2,favorite_set_key(user_id),favorite_version_key(user_id),
+                                "srem",str(news_id),expire)
+    except Exception as e:
+        print(e)
+
+async def clear_cached_favorites(user_id:int,expire:int=FAVORITE_SET_EXPIRE):
+    try:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.incr(favorite_version_key(user_id))
+            pipe.expire(favorite_version_key(user_id),expire)
+            pipe.delete(favorite_set_key(user_id))
+            await pipe.execute()
+    except Exception as e:
+        print(e)
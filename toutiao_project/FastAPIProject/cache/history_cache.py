@@ -0,0 +1,175 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.cache_config import redis_client
+
+# 每个用户最近浏览的新闻：有序集合，成员为新闻ID，分数为浏览时间戳，只保留最近 HISTORY_RECENT_SIZE 条
+# 浏览记录总数单独保存，总数键存在即表示已加载(历史为空时只有总数键)
+HISTORY_RECENT_PREFIX = "history:recent:"
+HISTORY_TOTAL_PREFIX = "history:total:"
+# 写入版本：每次写入(不论缓存是否已加载)都加一，加载前后版本不一致说明期间有写入，放弃这次加载
+HISTORY_VERSION_PREFIX = "history:ver:"
+HISTORY_RECENT_SIZE = 200
+HISTORY_RECENT_EXPIRE = 86400
+
+
+def history_recent_key(user_id:int):
+    return f"{HISTORY_RECENT_PREFIX}{user_id}"
+
+
+def history_total_key(user_id:int):
+    return f"{HISTORY_TOTAL_PREFIX}{user_id}"
+
+
+def history_version_key(user_id:int):
+    return f"{HISTORY_VERSION_PREFIX}{user_id}"
+
+
+async def get_cached_history_page(user_id:int,start:int,stop:int) -> Optional[Tuple[Optional[List[int]],int]]:
+    """
+    按浏览时间倒序取第 start~stop 条(含)的新闻ID和总数
+    未加载(或 Redis 不可用)时返回 None；这一页超出缓存范围时新闻ID为 None，只返回总数
+    """
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.get(history_total_key(user_id))
+            pipe.zrevrange(history_recent_key(user_id),start,stop)
+            pipe.zcard(history_recent_key(user_id))
+            total, members, size = await pipe.execute()
+    except Exception as e:
+        print(e)
+        return None
+    if total is None:
+        return None
+    total = int(total)
+    # 缓存里已经是全部浏览记录，或者这一页完整落在缓存范围内
+    if size >= total or stop < size:
+        return [int(member) for member in members], total
+    return None, total
+
+
+async def get_cached_history_total(user_id:int) -> Optional[int]:
+    try:
+        total = await redis_client.get(history_total_key(user_id))
+        return int(total) if total is not None else None
+    except Exception as e:
+        print(e)
+        return None
+
+
+async def get_history_version(user_id:int) -> Optional[str]:
+    """
+    加载前读取写入版本，交给 load_cached_history 校验；Redis 不可用时返回 None，不做加载
+    """
+    try:
+        return await redis_client.get(history_version_key(user_id)) or "0"
+    except Exception as e:
+        print(e)
+        return None
+
+
+# 加载前后写入版本一致才写入缓存，否则读取数据库期间有新的写入，快照可能已经过时
+# KEYS[1] 最近列表 KEYS[2] 总数 KEYS[3] 写入版本；ARGV[1] 加载前的版本 ARGV[2] 上限 ARGV[3] 过期时间
+# ARGV[4] 总数 ARGV[5...] 分数、成员交替
+_LOAD_HISTORY_SCRIPT = """
+if (redis.call('get', KEYS[3]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('del', KEYS[1])
+for i = 5, #ARGV, 2 do
+    redis.call('zadd', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('zremrangebyrank', KEYS[1], 0, -(tonumber(ARGV[2]) + 1))
+redis.call('expire', KEYS[1], ARGV[3])
+redis.call('set', KEYS[2], ARGV[4], 'EX', ARGV[3])
+return 1
+"""
+
+
+async def load_cached_history(user_id:int,version:str,total:int,entries:Iterable[Tuple[int,float]],
+                              expire:int=HISTORY_RECENT_EXPIRE):
+    """
+    用数据库中最近的浏览记录 (新闻ID, 时间戳) 和总数初始化缓存，version 为读取数据库之前的写入版本
+    """
+    args = [version,HISTORY_RECENT_SIZE,expire,total]
+    for news_id,score in entries:
+        args.extend((score,str(news_id)))
+    try:
+        return await redis_client.eval(_LOAD_HISTORY_SCRIPT,3,history_recent_key(user_id),
+                                       history_total_key(user_id),history_version_key(user_id),*args)
+    except Exception as e:
+        print(e)
+
+
+# 先加写入版本(让进行中的加载失效)，已加载时再写入：加入浏览记录并按上限裁剪，总数加上真正新增的条数
+# KEYS[1] 最近列表 KEYS[2] 总数 KEYS[3] 写入版本；ARGV[1] 上限 ARGV[2] 过期时间 ARGV[3] 新增条数 ARGV[4...] 分数、成员交替
+_ADD_HISTORY_SCRIPT = """
+redis.call('incr', KEYS[3])
+redis.call('expire', KEYS[3], ARGV[2])
+if redis.call('exists', KEYS[2]) == 0 then
+    return 0
+end
+for i = 4, #ARGV, 2 do
+    redis.call('zadd', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('zremrangebyrank', KEYS[1], 0, -(tonumber(ARGV[1]) + 1))
+redis.call('incrby', KEYS[2], ARGV[3])
+redis.call('expire', KEYS[1], ARGV[2])
+redis.call('expire', KEYS[2], ARGV[2])
+return 1
+"""
+
+# 删除一条：最近列表中不一定有(更早的记录)，总数照样减一
+_REMOVE_HISTORY_SCRIPT = """
+redis.call('incr', KEYS[3])
+redis.call('expire', KEYS[3], ARGV[2])
+if redis.call('exists', KEYS[2]) == 0 then
+    return 0
+end
+redis.call('zrem', KEYS[1], ARGV[1])
+redis.call('decr', KEYS[2])
+return 1
+"""
+
+
+def _history_keys(user_id:int):
+    return history_recent_key(user_id),history_total_key(user_id),history_version_key(user_id)
+
+
+async def add_cached_history(entries:Dict[int,List[Tuple[int,float,bool]]],expire:int=HISTORY_RECENT_EXPIRE):
+    """
+    entries: user_id -> [(新闻ID, 时间戳, 是否新插入的记录)]，一次 pipeline 写入多个用户
+    """
+    if not entries:
+        return
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for user_id,items in entries.items():
+                args = [HISTORY_RECENT_SIZE,expire,sum(1 for _,_,is_new in items if is_new)]
+                for news_id,score,_ in items:
+                    args.extend((score,str(news_id)))
+                pipe.eval(_ADD_HISTORY_SCRIPT,3,*_history_keys(user_id),*args)
+            await pipe.execute()
+    except Exception as e:
+        print(e)
+
+
+async def remove_cached_history(user_id:int,news_id:int,expire:int=HISTORY_RECENT_EXPIRE):
+    try:
+        await redis_client.eval(_REMOVE_HISTORY_SCRIPT,3,*_history_keys(user_id),str(news_id),expire)
+    except Exception as e:
+        print(e)
+
+
+async def clear_cached_history(user_id:int,expire:int=HISTORY_RECENT_EXPIRE):
+    """
+    清空后直接记为"已加载、总数为 0"，下次读取不用回源
+    """
+    try:
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.incr(history_version_key(user_id))
+            pipe.expire(history_version_key(user_id),expire)
+            pipe.delete(history_recent_key(user_id))
+            pipe.set(history_total_key(user_id),0,ex=expire)
+            await pipe.execute()
+    except Exception as e:
+        print(e)
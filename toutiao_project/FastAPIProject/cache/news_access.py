@@ -0,0 +1,60 @@
+from collections import Counter
+from typing import List, Tuple
+
+from config.cache_config import redis_client
+
+# 列表页访问统计：有序集合，成员为 "分类ID:页码:每页条数"，分数为随时间衰减的访问次数，启动预热按它挑选最热的列表页
+# 请求里只在进程内计数，由后台任务定期合并到 Redis，列表接口不增加 Redis 往返
+NEWS_ACCESS_KEY = "news:access:list"
+NEWS_ACCESS_HALF_LIFE = 24 * 3600     # 访问次数半衰期(秒)
+NEWS_ACCESS_MAX_SIZE = 1000           # 最多保留的列表页数
+
+_pending_access: Counter = Counter()
+
+
+def record_news_list_access(category_id:int,page:int,size:int):
+    _pending_access[f"{category_id}:{page}:{size}"] += 1
+
+
+async def flush_news_list_access():
+    """
+    把进程内累计的访问次数合并到 Redis，返回合并的列表页数；失败时放回等待下次合并
+    """
+    global _pending_access
+    if not _pending_access:
+        return 0
+    pending, _pending_access = _pending_access, Counter()
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for member,count in pending.items():
+                pipe.zincrby(NEWS_ACCESS_KEY,count,member)
+            pipe.zremrangebyrank(NEWS_ACCESS_KEY,0,-(NEWS_ACCESS_MAX_SIZE+1))
+            await pipe.execute()
+    except Exception as e:
+        print(e)
+        _pending_access.update(pending)
+        return 0
+    return len(pending)
+
+
+async def decay_news_list_access(factor:float):
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.zunionstore(NEWS_ACCESS_KEY,{NEWS_ACCESS_KEY:factor})
+        pipe.zremrangebyrank(NEWS_ACCESS_KEY,0,-(NEWS_ACCESS_MAX_SIZE+1))
+        await pipe.execute()
+
+
+async def get_hottest_news_lists(limit:int) -> List[Tuple[int,int,int]]:
+    """
+    访问最多的 limit 个列表页，返回 [(分类ID, 页码, 每页条数)]
+    """
+    try:
+        members = await redis_client.zrevrange(NEWS_ACCESS_KEY,0,limit-1)
+    except Exception as e:
+        print(e)
+        return []
+    hottest = []
+    for member in members:
+        category_id, page, size = member.split(":")
+        hottest.append((int(category_id),int(page),int(size)))
+    return hottest
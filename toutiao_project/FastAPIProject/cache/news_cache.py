@@ -1,24 +1,169 @@
-from typing import Dict, Any, List, Optional
+import time
+from typing import Dict, Any, Iterable, List, Optional
 
-from config.cache_config import get_json_cache, set_cache
+from cache.single_flight import get_or_load, Loader
+from config import cache_codec
+from config.cache_config import get_json_cache, set_cache, get_cache, redis_client, get_many, set_many, \
+    delete_cache, publish_invalidation
+from config.local_cache import local_cache
 
 CATEGORIES_KEY = "news:categories"
-NEWS_LIST_PREFIX = "news:list:"
+CATEGORIES_EXPIRE = 7 * 86400
+# 列表页缓存的是接口 data 的主体 {"list","hasMore","nextCursor"}，与旧的 news:list: 纯列表格式区分开
+NEWS_LIST_PREFIX = "news:page:"
+# 列表页 key 带分类版本号，新闻增删改后版本号变化，旧页面不再可达，TTL 只用于回收旧 key 和限制浏览量的陈旧程度
+NEWS_LIST_EXPIRE = 86400
+NEWS_VERSION_PREFIX = "news:ver:"
+NEWS_COUNT_PREFIX = "news:count:"
+NEWS_COUNT_EXPIRE = 86400
+RELATED_NEWS_PREFIX = "news:related:"
+RELATED_NEWS_EXPIRE = 3600
+
+# 分类几乎不变，各分类的前两页是绝大多数流量，放进进程内缓存减少Redis访问
+local_cache.add_rule(CATEGORIES_KEY,300)
+local_cache.add_rule(f"{NEWS_LIST_PREFIX}*:1:*",60)
+local_cache.add_rule(f"{NEWS_LIST_PREFIX}*:2:*",60)
+local_cache.add_rule(f"{RELATED_NEWS_PREFIX}*",60)
+# 版本号每次读列表都要用，放进本地缓存；版本变化时通过失效通知清掉各worker的副本
+local_cache.add_rule(f"{NEWS_VERSION_PREFIX}*",60)
 
 async def get_cached_categories():
     return await get_json_cache(CATEGORIES_KEY)
 
-async def set_cache_categories(data:List[Dict[str,Any]],expire:int=7200):
+async def set_cache_categories(data:List[Dict[str,Any]],expire:int=CATEGORIES_EXPIRE):
     return await set_cache(CATEGORIES_KEY,data,expire)
 
+async def evict_cached_categories():
+    return await delete_cache(CATEGORIES_KEY)
+
+
+def news_version_key(category_id:Optional[int]):
+    category_part = category_id if category_id is not None else "all"
+    return f"{NEWS_VERSION_PREFIX}{category_part}"
+
+def _initial_version():
+    # 版本号 key 丢失后从当前毫秒时间戳重新开始，不会退回到旧页面用过的版本号
+    return int(time.time() * 1000)
+
+async def get_news_version(category_id:Optional[int]) -> int:
+    """
+    读取分类的列表版本号，不存在时初始化；Redis 不可用时返回 0，此时列表缓存本身也读不到
+    """
+    key = news_version_key(category_id)
+    entry = local_cache.get(key)
+    if entry is not None:
+        return entry.value
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.set(key,_initial_version(),nx=True)
+            pipe.get(key)
+            _, version = await pipe.execute()
+        version = int(version)
+        local_cache.set(key,version,len(key))
+        return version
+    except Exception as e:
+        print(e)
+        return 0
 
-async def set_cache_news_list(category_id:Optional[int],page:int,size:int,news_list:List[Dict[str,Any]],expire:int=7200):
-    categories_part = category_id if category_id is not None else "all"
-    key = f"{NEWS_LIST_PREFIX}{categories_part}:{page}:{size}"
-    return await set_cache(key,news_list,expire)
 
-async def get_cache_news_list(category_id:Optional[int],page:int,size:int):
+# 版本号存在时 +1，不存在时从当前时间戳开始，避免 INCR 从 1 重新计数撞上还没过期的旧页面
+_BUMP_VERSION_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('incr', KEYS[1])
+end
+redis.call('set', KEYS[1], ARGV[1])
+return tonumber(ARGV[1])
+"""
+
+async def bump_news_versions(category_ids:Iterable[Optional[int]]):
+    """
+    新闻增删改后调用，使这些分类已缓存的列表页全部失效
+    """
+    for category_id in category_ids:
+        key = news_version_key(category_id)
+        local_cache.delete(key)
+        try:
+            await redis_client.eval(_BUMP_VERSION_SCRIPT,1,key,_initial_version())
+            await publish_invalidation(key)
+        except Exception as e:
+            print(e)
+
+
+def news_list_key(category_id:Optional[int],page:int,size:int,version:int=0):
     category_part = category_id if category_id is not None else "all"
-    key = f"{NEWS_LIST_PREFIX}{category_part}:{page}:{size}"
-    return await get_json_cache(key)
+    return f"{NEWS_LIST_PREFIX}{category_part}:v{version}:{page}:{size}"
+
+
+async def get_or_load_news_page_json(category_id:int,version:int,page:int,size:int,loader:Loader,expire:int=NEWS_LIST_EXPIRE,
+                                     prefetched=None) -> bytes:
+    """
+    读取新闻列表页，缺失时合并并发回源，临近过期时提前刷新，避免热点key过期瞬间击穿数据库
+    总是返回 JSON 字节：命中时是缓存里的原始字节，回源时把结果序列化一次
+    """
+    data = await get_or_load(news_list_key(category_id,page,size,version),loader,expire,prefetched)
+    if isinstance(data,bytes):
+        return data
+    return cache_codec.dumps_json(data)
+
+async def get_cache_news_page(category_id:int,version:int,page:int,size:int):
+    """
+    一次往返同时读取列表页(含剩余TTL，用于提前刷新)和分类总数
+    列表页按 JSON 字节返回，不反序列化；返回 ((JSON字节, 剩余秒数), 总数)，未命中的部分为 None
+    """
+    list_key = news_list_key(category_id,page,size,version)
+    count_key = news_count_key(category_id)
+    values, ttls = await get_many([list_key,count_key],with_ttl=True,raw=True)
+    count = values.get(count_key)
+    return (values.get(list_key),ttls.get(list_key)), (int(count) if count is not None else None)
+
+
+def news_count_key(category_id:int):
+    return f"{NEWS_COUNT_PREFIX}{category_id}"
+
+async def get_cached_news_count(category_id:int):
+    count = await get_cache(news_count_key(category_id))
+    return int(count) if count is not None else None
+
+async def set_cache_news_count(category_id:int,count:int,expire:int=NEWS_COUNT_EXPIRE):
+    return await set_cache(news_count_key(category_id),count,expire)
+
+
+# 计数只在 key 存在时累加，key 不存在时由下一次读取从计数表加载，避免凭增量造出错误的总数
+_INCR_IF_EXISTS_SCRIPT = """
+if redis.call('exists', KEYS[1]) == 1 then
+    return redis.call('incrby', KEYS[1], ARGV[1])
+end
+return nil
+"""
+
+async def incr_cached_news_count(category_id:int,delta:int):
+    try:
+        await redis_client.eval(_INCR_IF_EXISTS_SCRIPT,1,news_count_key(category_id),delta)
+    except Exception as e:
+        print(e)
+
+
+def related_news_key(category_id:int):
+    return f"{RELATED_NEWS_PREFIX}{category_id}"
+
+async def get_cached_related_news(category_id:int):
+    """
+    返回 (候选列表, 刷新时间戳)，没有缓存时返回 (None, None)
+    """
+    key = related_news_key(category_id)
+    values, _ = await get_many([key])
+    data = values.get(key)
+    if not data:
+        return None, None
+    return data["items"], data["refreshed_at"]
+
+async def set_cache_related_news(category_id:int,items:List[Dict[str,Any]],expire:int=RELATED_NEWS_EXPIRE):
+    return await set_cache_related_news_many({category_id:items},expire)
 
+async def set_cache_related_news_many(items_by_category:Dict[int,List[Dict[str,Any]]],expire:int=RELATED_NEWS_EXPIRE):
+    """
+    批量写入多个分类的相关新闻，一次 pipeline 完成
+    """
+    refreshed_at = time.time()
+    return await set_many({related_news_key(category_id):{"items":items,"refreshed_at":refreshed_at}
+                           for category_id,items in items_by_category.items()},expire)
@@ -0,0 +1,42 @@
+from typing import Dict, Optional
+
+from config.cache_config import redis_client
+
+# 详情页浏览量先累加到 Redis 哈希中，由后台任务定时批量写回 MySQL
+PENDING_VIEWS_KEY = "news:views:pending"
+# 正在写回的批次；上一批没确认(DEL)前不会再取新批次，进程崩溃后下次刷写会重试这一批
+FLUSHING_VIEWS_KEY = "news:views:flushing"
+
+
+async def incr_news_views(news_id:int) -> Optional[int]:
+    """
+    浏览量 +1，返回尚未写回数据库的增量（含本次）；Redis 不可用时返回 None
+    """
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.hincrby(PENDING_VIEWS_KEY,str(news_id),1)
+            pipe.hget(FLUSHING_VIEWS_KEY,str(news_id))
+            pending, flushing = await pipe.execute()
+        return int(pending) + int(flushing or 0)
+    except Exception as e:
+        print(e)
+        return None
+
+
+async def take_buffered_news_views() -> Dict[int,int]:
+    """
+    取出一批待写回的增量：优先重试上次未确认的批次，否则把累加中的哈希原子地改名为写回批次
+    """
+    if not await redis_client.exists(FLUSHING_VIEWS_KEY):
+        if not await redis_client.exists(PENDING_VIEWS_KEY):
+            return {}
+        await redis_client.rename(PENDING_VIEWS_KEY,FLUSHING_VIEWS_KEY)
+    data = await redis_client.hgetall(FLUSHING_VIEWS_KEY)
+    return {int(news_id):int(delta) for news_id,delta in data.items() if int(delta) > 0}
+
+
+async def ack_buffered_news_views():
+    """
+    批次已提交到数据库，删除写回批次
+    """
+    await redis_client.delete(FLUSHING_VIEWS_KEY)
@@ -0,0 +1,34 @@
+from typing import Dict, Iterable, List, Tuple
+
+from config.cache_config import get_many, set_many, delete_pattern
+
+# 离线任务算好的相似新闻：news:similar:{新闻ID} -> [[相似新闻ID, 相似度], ...]，按相似度倒序
+SIMILAR_NEWS_PREFIX = "news:similar:"
+# 增量更新只重写有变化的新闻，没变化的邻居要一直保留，过期时间远长于任务周期
+SIMILAR_NEWS_EXPIRE = 30 * 86400
+
+
+def similar_news_key(news_id:int):
+    return f"{SIMILAR_NEWS_PREFIX}{news_id}"
+
+
+async def get_similar_news_many(news_ids:Iterable[int]) -> Dict[int,List[Tuple[int,float]]]:
+    """
+    一次 MGET 读取多条新闻的相似新闻，没有结果的新闻不出现在返回值中
+    """
+    keys = {similar_news_key(news_id):news_id for news_id in news_ids}
+    values, _ = await get_many(keys)
+    return {keys[key]:[(int(neighbour_id),float(score)) for neighbour_id,score in value]
+            for key,value in values.items()}
+
+
+async def set_similar_news_many(neighbours:Dict[int,List[Tuple[int,float]]],expire:int=SIMILAR_NEWS_EXPIRE):
+    return await set_many({similar_news_key(news_id):[[neighbour_id,round(score,6)] for neighbour_id,score in items]
+                           for news_id,items in neighbours.items()},expire)
+
+
+async def clear_similar_news():
+    """
+    删除全部相似新闻(全量重建前调用)：不再满足条件的新闻不会被重写，旧结果要到过期才消失
+    """
+    return await delete_pattern(f"{SIMILAR_NEWS_PREFIX}*")
@@ -0,0 +1,121 @@
+import asyncio
+import math
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Set, Tuple
+
+from config.cache_config import get_json_cache_with_ttl, set_cache, acquire_lock, release_lock
+
+LOCK_PREFIX = "lock:"
+LOCK_TTL_MS = 3000          # 重建缓存的分布式锁过期时间(毫秒)，只需覆盖一次回源查询
+WAIT_TIMEOUT = 3.0          # 没抢到锁时，等待其他worker回填缓存的最长时间(秒)
+WAIT_INTERVAL = 0.05        # 等待期间轮询缓存的间隔(秒)
+EARLY_REFRESH_BETA = 1.0    # 提前刷新系数，越大越倾向于提前刷新
+DEFAULT_REBUILD_COST = 0.05 # 没有历史耗时记录时假定的回源耗时(秒)
+MAX_COST_ENTRIES = 10000
+
+# 本进程内正在重建的key -> 重建任务，同一个key只允许一个协程回源
+_inflight: Dict[str, asyncio.Task] = {}
+# key -> 最近一次回源耗时，用于计算提前刷新的概率
+_rebuild_cost: Dict[str, float] = {}
+# 持有后台刷新任务的引用，防止任务被垃圾回收
+_background_tasks: Set[asyncio.Task] = set()
+
+Loader = Callable[[], Awaitable[Any]]
+
+
+def _record_cost(key: str, cost: float):
+    if len(_rebuild_cost) >= MAX_COST_ENTRIES and key not in _rebuild_cost:
+        _rebuild_cost.clear()
+    _rebuild_cost[key] = cost
+
+
+def _should_refresh_early(key: str, ttl: Optional[float]) -> bool:
+    """
+    概率性提前过期(XFetch)：回源越慢、剩余时间越短，越可能提前刷新
+    随机性让各请求/各worker的刷新时间点错开，避免同一时刻集中回源
+    """
+    if ttl is None:
+        return False
+    cost = _rebuild_cost.get(key, DEFAULT_REBUILD_COST)
+    # 1 - random() 取值 (0, 1]，避免 log(0)
+    return cost * EARLY_REFRESH_BETA * -math.log(1.0 - random.random()) >= ttl
+
+
+async def _load_and_store(key: str, loader: Loader, expire: int):
+    start = time.monotonic()
+    data = await loader()
+    _record_cost(key, time.monotonic() - start)
+    if data:
+        await set_cache(key, data, expire)
+    return data
+
+
+async def _rebuild(key: str, loader: Loader, expire: int):
+    """
+    缓存缺失时重建：抢到Redis锁的worker回源，其余worker轮询等待回填
+    等待超时则自行回源，保证锁持有者异常时请求依然可用
+    """
+    lock_key = LOCK_PREFIX + key
+    token = await acquire_lock(lock_key, LOCK_TTL_MS)
+    if token is None:
+        deadline = time.monotonic() + WAIT_TIMEOUT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(WAIT_INTERVAL)
+            data, _ = await get_json_cache_with_ttl(key)
+            if data:
+                return data
+    try:
+        return await _load_and_store(key, loader, expire)
+    finally:
+        if token is not None:
+            await release_lock(lock_key, token)
+
+
+async def _refresh(key: str, loader: Loader, expire: int):
+    """
+    后台提前刷新：抢不到锁说明其他worker已在刷新，直接放弃
+    """
+    lock_key = LOCK_PREFIX + key
+    token = await acquire_lock(lock_key, LOCK_TTL_MS)
+    if token is None:
+        return None
+    try:
+        return await _load_and_store(key, loader, expire)
+    except Exception as e:
+        print(e)
+        return None
+    finally:
+        await release_lock(lock_key, token)
+
+
+def _run_once(key: str, coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _inflight[key] = task
+    task.add_done_callback(lambda _: _inflight.pop(key, None))
+    return task
+
+
+async def get_or_load(key: str, loader: Loader, expire: int, prefetched: Optional[Tuple[Any, Optional[float]]] = None):
+    """
+    带请求合并的缓存读取
+    - 命中：直接返回，临近过期时概率性触发一次后台刷新，本次仍返回旧值
+    - 缺失：同一进程内只有一个协程回源，其余协程等待同一个结果；跨worker由Redis短锁保证
+    loader 必须自行管理数据库会话，不能复用请求内的 session（可能被多个协程或后台任务共享）
+    prefetched 为调用方已批量读到的 (值, 剩余秒数)，传入时不再单独读取缓存
+    """
+    if prefetched is None:
+        prefetched = await get_json_cache_with_ttl(key)
+    data, ttl = prefetched
+    if data:
+        if key not in _inflight and _should_refresh_early(key, ttl):
+            task = _run_once(key, _refresh(key, loader, expire))
+            _background_tasks.add(task)
+            task.add_done_callback(_background_tasks.discard)
+        return data
+
+    task = _inflight.get(key)
+    if task is None:
+        task = _run_once(key, _rebuild(key, loader, expire))
+    # shield：某个请求被取消不会中断共享的重建任务
+    return await asyncio.shield(task)
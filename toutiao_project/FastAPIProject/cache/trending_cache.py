@@ -0,0 +1,73 @@
+from typing import List, Optional
+
+from cache.single_flight import get_or_load, Loader
+from config.cache_config import redis_client
+from config.local_cache import local_cache
+
+# 热度榜：有序集合，成员为新闻ID，分数为随时间衰减的浏览热度
+# 全站一个榜，每个分类一个榜；浏览时 ZINCRBY，后台任务定时按半衰期整体衰减并裁剪
+TRENDING_PREFIX = "news:trend:"
+TRENDING_ALL_KEY = f"{TRENDING_PREFIX}all"
+TRENDING_HALF_LIFE = 6 * 3600     # 热度半衰期(秒)
+TRENDING_MIN_SCORE = 0.1          # 衰减到这个分数以下的新闻移出榜单
+TRENDING_MAX_SIZE = 1000          # 每个榜单最多保留的新闻数，限制内存占用
+
+# 热榜接口的结果缓存(新闻卡片列表)，榜单本身变化很快，短时间缓存即可
+HOT_NEWS_PREFIX = "news:hot:"
+HOT_NEWS_EXPIRE = 60
+
+local_cache.add_rule(f"{HOT_NEWS_PREFIX}*",10)
+
+
+def trending_key(category_id:Optional[int]):
+    return TRENDING_ALL_KEY if category_id is None else f"{TRENDING_PREFIX}cat:{category_id}"
+
+
+def hot_news_key(category_id:Optional[int],limit:int):
+    category_part = category_id if category_id is not None else "all"
+    return f"{HOT_NEWS_PREFIX}{category_part}:{limit}"
+
+
+async def record_trending_view(news_id:int,category_id:int):
+    """
+    记一次浏览：全站榜和分类榜各 +1，一次 pipeline 完成
+    """
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.zincrby(TRENDING_ALL_KEY,1,str(news_id))
+            pipe.zincrby(trending_key(category_id),1,str(news_id))
+            await pipe.execute()
+    except Exception as e:
+        print(e)
+
+
+async def get_trending_news_ids(category_id:Optional[int],limit:int) -> List[int]:
+    """
+    按热度取前 limit 条新闻ID，ZREVRANGE 为 O(log n + limit)
+    """
+    try:
+        members = await redis_client.zrevrange(trending_key(category_id),0,limit-1)
+        return [int(member) for member in members]
+    except Exception as e:
+        print(e)
+        return []
+
+
+async def decay_trending_board(key:str,factor:float):
+    """
+    整个榜单的分数乘以 factor(ZUNIONSTORE 单个集合带 WEIGHTS)，
+    再删除低于阈值的新闻并只保留前 TRENDING_MAX_SIZE 条；放在一个事务里执行，期间的 ZINCRBY 不会丢失
+    """
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.zunionstore(key,{key:factor})
+        pipe.zremrangebyscore(key,"-inf",f"({TRENDING_MIN_SCORE}")
+        pipe.zremrangebyrank(key,0,-(TRENDING_MAX_SIZE+1))
+        await pipe.execute()
+
+
+async def scan_trending_boards() -> List[str]:
+    return [key async for key in redis_client.scan_iter(match=f"{TRENDING_PREFIX}*",count=500)]
+
+
+async def get_or_load_hot_news(category_id:Optional[int],limit:int,loader:Loader,expire:int=HOT_NEWS_EXPIRE):
+    return await get_or_load(hot_news_key(category_id,limit),loader,expire)
@@ -0,0 +1,51 @@
+import datetime
+from typing import Any, Dict, Optional
+
+from config.cache_config import get_json_cache, set_cache, delete_cache
+from config.local_cache import local_cache
+from utils.metrics import TOKEN_CACHE_LOOKUPS, TOKEN_CACHE_HIT_RATE, register_collector
+
+TOKEN_USER_PREFIX = "user:token:"
+TOKEN_USER_EXPIRE = 1800
+
+# 每个请求都会做令牌解析，放进进程内缓存；登出/改密码时通过失效通知同步到所有worker
+local_cache.add_rule(f"{TOKEN_USER_PREFIX}*",30)
+
+# 令牌解析缓存命中统计
+TOKEN_CACHE_STATS = {"hits": 0, "misses": 0}
+
+
+def token_user_key(token:str):
+    return f"{TOKEN_USER_PREFIX}{token}"
+
+async def get_cached_token_user(token:str) -> Optional[Dict[str,Any]]:
+    data = await get_json_cache(token_user_key(token))
+    if data is None or datetime.datetime.fromisoformat(data["expires_at"]) < datetime.datetime.now():
+        TOKEN_CACHE_STATS["misses"] += 1
+        return None
+    TOKEN_CACHE_STATS["hits"] += 1
+    return data["user"]
+
+async def set_cache_token_user(token:str,user_data:Dict[str,Any],expires_at:datetime.datetime):
+    """
+    缓存令牌对应的用户信息，过期时间不超过令牌本身的过期时间
+    """
+    remaining = int((expires_at - datetime.datetime.now()).total_seconds())
+    if remaining <= 0:
+        return False
+    data = {"user":user_data,"expires_at":expires_at.isoformat()}
+    return await set_cache(token_user_key(token),data,min(TOKEN_USER_EXPIRE,remaining))
+
+async def evict_token_user(token:str):
+    return await delete_cache(token_user_key(token))
+
+def token_cache_stats():
+    total = TOKEN_CACHE_STATS["hits"] + TOKEN_CACHE_STATS["misses"]
+    return {**TOKEN_CACHE_STATS,"hit_rate":TOKEN_CACHE_STATS["hits"] / total if total else 0.0}
+
+@register_collector
+def _collect_token_cache_stats():
+    stats = token_cache_stats()
+    TOKEN_CACHE_LOOKUPS.set(stats["hits"],"hit")
+    TOKEN_CACHE_LOOKUPS.set(stats["misses"],"miss")
+    TOKEN_CACHE_HIT_RATE.set(stats["hit_rate"])
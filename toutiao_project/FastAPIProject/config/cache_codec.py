@@ -0,0 +1,105 @@
+import json
+import zlib
+from typing import Any, Callable, Dict, Tuple
+
+# 可选依赖：装了就用更快/更紧凑的实现，没装退回标准库
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+# 缓存值格式：MAGIC(1字节) + 序列化方式(1字节) + 压缩方式(1字节) + 数据
+# JSON 文本不可能以 \x00 开头，没有 MAGIC 的值按旧格式(纯 JSON 文本)解析，新旧格式可以共存
+MAGIC = b"\x00"
+
+CACHE_CODEC = "json"            # 序列化方式：json / msgpack
+CACHE_COMPRESSION = "zlib"      # 压缩方式：none / zlib / lz4
+COMPRESS_THRESHOLD = 1024       # 序列化后超过这么多字节才压缩
+ZLIB_LEVEL = 1
+
+
+def _json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def _json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _msgpack_dumps(value: Any) -> bytes:
+    return msgpack.packb(value, use_bin_type=True)
+
+
+def _msgpack_loads(data: bytes) -> Any:
+    return msgpack.unpackb(data, raw=False)
+
+
+SERIALIZERS: Dict[str, Tuple[bytes, Callable[[Any], bytes], Callable[[bytes], Any]]] = {
+    "json": (b"j", _json_dumps, _json_loads),
+}
+if msgpack is not None:
+    SERIALIZERS["msgpack"] = (b"m", _msgpack_dumps, _msgpack_loads)
+
+COMPRESSORS: Dict[str, Tuple[bytes, Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    "none": (b"-", lambda data: data, lambda data: data),
+    "zlib": (b"z", lambda data: zlib.compress(data, ZLIB_LEVEL), zlib.decompress),
+}
+if lz4_frame is not None:
+    COMPRESSORS["lz4"] = (b"4", lz4_frame.compress, lz4_frame.decompress)
+
+_SERIALIZERS_BY_ID = {tag: (dumps, loads) for tag, dumps, loads in SERIALIZERS.values()}
+_COMPRESSORS_BY_ID = {tag: (compress, decompress) for tag, compress, decompress in COMPRESSORS.values()}
+
+
+def encode(value: Any, codec: str = None, compression: str = None, threshold: int = None) -> bytes:
+    """
+    按配置序列化并(超过阈值时)压缩，未安装的可选编解码器会退回 json / zlib
+    """
+    codec_tag, dumps, _ = SERIALIZERS.get(codec or CACHE_CODEC, SERIALIZERS["json"])
+    payload = dumps(value)
+    threshold = COMPRESS_THRESHOLD if threshold is None else threshold
+    compress_tag, compress, _ = COMPRESSORS["none"]
+    if len(payload) >= threshold:
+        compress_tag, compress, _ = COMPRESSORS.get(compression or CACHE_COMPRESSION, COMPRESSORS["zlib"])
+    return MAGIC + codec_tag + compress_tag + compress(payload)
+
+
+def dumps_json(value: Any) -> bytes:
+    return _json_dumps(value)
+
+
+def to_json_bytes(data: bytes) -> bytes:
+    """
+    把缓存值还原成 JSON 字节而不构造 Python 对象：JSON 编码的值只需解压，可以直接拼进响应体
+    """
+    if not data.startswith(MAGIC):
+        return data
+    if data[1:2] == SERIALIZERS["json"][0]:
+        _, decompress = _COMPRESSORS_BY_ID[data[2:3]]
+        return decompress(data[3:])
+    return _json_dumps(decode(data))
+
+
+def decode(data: bytes) -> Any:
+    """
+    根据值头部的标记解码，兼容没有头部的旧 JSON 文本
+    """
+    if not data.startswith(MAGIC):
+        return json.loads(data)
+    _, loads = _SERIALIZERS_BY_ID[data[1:2]]
+    _, decompress = _COMPRESSORS_BY_ID[data[2:3]]
+    return loads(decompress(data[3:]))
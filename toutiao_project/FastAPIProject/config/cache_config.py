@@ -1,8 +1,15 @@
+import asyncio
 import json
-from typing import Any
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 
 import redis.asyncio as redis
 
+from config import cache_codec
+from config.local_cache import local_cache, RAW_ONLY
+from utils.metrics import record_cache
+
 REDIS_HOST = 'localhost'
 REDIS_PORT = 6379
 REDIS_DB = 0
@@ -14,18 +21,52 @@ redis_client = redis.Redis(
     decode_responses=True
 )
 
+# JSON 类缓存值经过 cache_codec 编码(可能是压缩后的二进制)，用不解码响应的客户端读写
+redis_binary_client = redis.Redis(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    decode_responses=False
+)
+
+# 本地缓存失效通知频道，每个worker用自己的ID过滤掉自己发出的消息
+INVALIDATION_CHANNEL = "cache:invalidate"
+WORKER_ID = uuid.uuid4().hex
+
+def _entry_value(entry):
+    # 以 JSON 字节进入本地缓存的条目，第一次按对象读取时才反序列化
+    if entry.value is RAW_ONLY:
+        entry.value = cache_codec.decode(entry.raw)
+    return entry.value
+
+def _entry_raw(entry):
+    if entry.raw is None:
+        entry.raw = cache_codec.dumps_json(entry.value)
+    return entry.raw
+
 async def get_cache(key:str):
+    start = time.perf_counter()
     try:
-        return await redis_client.get(key)
+        value = await redis_client.get(key)
+        record_cache(hits=int(value is not None),misses=int(value is None),seconds=time.perf_counter()-start)
+        return value
     except Exception as e:
         print(e)
         return None
 
 async def get_json_cache(key:str):
+    entry = local_cache.get(key)
+    if entry is not None:
+        record_cache(hits=1,tier="local")
+        return _entry_value(entry)
+    start = time.perf_counter()
     try:
-        data = await redis_client.get(key)
+        data = await redis_binary_client.get(key)
+        record_cache(hits=int(bool(data)),misses=int(not data),seconds=time.perf_counter()-start)
         if data:
-            return json.loads(data)
+            value = cache_codec.decode(data)
+            local_cache.set(key,value,len(data))
+            return value
         return None
     except Exception as e:
         print(e)
@@ -34,9 +75,206 @@ async def get_json_cache(key:str):
 async def set_cache(key:str,value:Any,expire:int=3600):
     try:
         if isinstance(value,(dict,list)):
-            value = json.dumps(value,ensure_ascii=False)
-        await redis_client.setex(key,expire,value)
+            data = cache_codec.encode(value)
+            await redis_binary_client.setex(key,expire,data)
+            local_cache.set(key,value,len(data),expire)
+            await publish_invalidation(key)
+        else:
+            await redis_client.setex(key,expire,value)
+        return True
+    except Exception as e:
+        print(e)
+        return False
+
+async def delete_cache(key:str):
+    local_cache.delete(key)
+    try:
+        await redis_client.delete(key)
+        await publish_invalidation(key)
+        return True
+    except Exception as e:
+        print(e)
+        return False
+
+async def get_many(keys:Iterable[str],with_ttl:bool=False,raw:bool=False) -> Tuple[Dict[str,Any],Dict[str,Optional[float]]]:
+    """
+    批量读取缓存：先查本地缓存，剩下的 key 用一次 MGET(需要 TTL 时连同 PTTL 放进同一个 pipeline)
+    返回 (命中的 key -> 值, key -> 剩余秒数)，未命中的 key 不出现在结果中
+    raw=True 时值为 JSON 字节，不反序列化，供直接拼接响应体
+    """
+    values = {}
+    ttls = {}
+    missing = []
+    for key in keys:
+        entry = local_cache.get(key)
+        if entry is not None and (not with_ttl or entry.remote_expires_at is not None):
+            values[key] = _entry_raw(entry) if raw else _entry_value(entry)
+            if with_ttl:
+                ttls[key] = entry.remote_expires_at - time.monotonic()
+        else:
+            missing.append(key)
+    if values:
+        record_cache(hits=len(values),tier="local")
+    if not missing:
+        return values, ttls
+    start = time.perf_counter()
+    try:
+        async with redis_binary_client.pipeline(transaction=False) as pipe:
+            pipe.mget(missing)
+            if with_ttl:
+                for key in missing:
+                    pipe.pttl(key)
+            results = await pipe.execute()
+        found = sum(1 for data in results[0] if data)
+        record_cache(hits=found,misses=len(missing)-found,seconds=time.perf_counter()-start)
+        for index,(key,data) in enumerate(zip(missing,results[0])):
+            if not data:
+                continue
+            ttl = None
+            if with_ttl:
+                pttl = results[index+1]
+                ttl = pttl / 1000 if pttl and pttl > 0 else None
+                ttls[key] = ttl
+            if raw:
+                value = cache_codec.to_json_bytes(data)
+                local_cache.set(key,RAW_ONLY,len(data),ttl,raw=value)
+            else:
+                value = cache_codec.decode(data)
+                local_cache.set(key,value,len(data),ttl)
+            values[key] = value
+    except Exception as e:
+        print(e)
+    return values, ttls
+
+async def set_many(mapping:Dict[str,Any],expire:int=3600):
+    """
+    批量写入缓存，所有 SETEX 和失效通知放进同一个 pipeline
+    """
+    if not mapping:
+        return True
+    try:
+        async with redis_binary_client.pipeline(transaction=False) as pipe:
+            for key,value in mapping.items():
+                if isinstance(value,(dict,list)):
+                    data = cache_codec.encode(value)
+                    local_cache.set(key,value,len(data),expire)
+                else:
+                    data = value
+                pipe.setex(key,expire,data)
+                if local_cache.ttl_for(key) is not None:
+                    pipe.publish(INVALIDATION_CHANNEL,json.dumps({"origin":WORKER_ID,"key":key}))
+            await pipe.execute()
         return True
     except Exception as e:
         print(e)
-        return False
\ No newline at end of file
+        return False
+
+async def delete_pattern(pattern:str,batch_size:int=500):
+    """
+    按模式删除缓存：SCAN 分批查找并 UNLINK，不用 KEYS 以免阻塞 Redis；返回删除的 key 数
+    """
+    local_cache.delete_pattern(pattern)
+    deleted = 0
+    try:
+        batch: List[str] = []
+        async for key in redis_client.scan_iter(match=pattern,count=batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                deleted += await redis_client.unlink(*batch)
+                batch = []
+        if batch:
+            deleted += await redis_client.unlink(*batch)
+        await redis_client.publish(INVALIDATION_CHANNEL,json.dumps({"origin":WORKER_ID,"pattern":pattern}))
+    except Exception as e:
+        print(e)
+    return deleted
+
+async def publish_invalidation(key:str):
+    """
+    通知其他worker丢弃本地缓存中的 key，只对登记了本地缓存规则的 key 发送
+    """
+    if local_cache.ttl_for(key) is None:
+        return
+    message = json.dumps({"origin":WORKER_ID,"key":key})
+    await redis_client.publish(INVALIDATION_CHANNEL,message)
+
+async def run_invalidation_listener():
+    """
+    订阅失效通知并清理本地缓存，断线期间可能漏掉消息，所以每次(重新)订阅成功都清空本地缓存
+    """
+    while True:
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            local_cache.clear()
+            async for message in pubsub.listen():
+                payload = json.loads(message["data"])
+                if payload.get("origin") == WORKER_ID:
+                    continue
+                if "pattern" in payload:
+                    local_cache.delete_pattern(payload["pattern"])
+                else:
+                    local_cache.delete(payload["key"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(e)
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.reset()
+
+async def get_json_cache_with_ttl(key:str):
+    """
+    读取JSON缓存，同时返回剩余过期时间(秒)，GET 与 PTTL 放在同一个 pipeline 中只走一次网络
+    """
+    entry = local_cache.get(key)
+    if entry is not None and entry.remote_expires_at is not None:
+        record_cache(hits=1,tier="local")
+        return _entry_value(entry), entry.remote_expires_at - time.monotonic()
+    start = time.perf_counter()
+    try:
+        async with redis_binary_client.pipeline(transaction=False) as pipe:
+            pipe.get(key)
+            pipe.pttl(key)
+            data, pttl = await pipe.execute()
+        record_cache(hits=int(bool(data)),misses=int(not data),seconds=time.perf_counter()-start)
+        if data:
+            ttl = pttl / 1000 if pttl and pttl > 0 else None
+            value = cache_codec.decode(data)
+            local_cache.set(key,value,len(data),ttl)
+            return value, ttl
+        return None, None
+    except Exception as e:
+        print(e)
+        return None, None
+
+
+# 只有持有者才能释放锁，避免锁过期后误删其他worker的新锁
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+async def acquire_lock(key:str,ttl_ms:int=3000):
+    """
+    获取短期分布式锁，成功返回锁token，锁被占用返回None
+    Redis不可用时视为加锁成功，由调用方直接回源，保证可用性
+    """
+    token = uuid.uuid4().hex
+    try:
+        if await redis_client.set(key,token,nx=True,px=ttl_ms):
+            return token
+        return None
+    except Exception as e:
+        print(e)
+        return token
+
+
+async def release_lock(key:str,token:str):
+    try:
+        await redis_client.eval(_RELEASE_LOCK_SCRIPT,1,key,token)
+    except Exception as e:
+        print(e)
@@ -0,0 +1,66 @@
+import logging
+import random
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from utils.metrics import record_query, record_pool_wait, register_collector, DB_SLOW_QUERIES, DB_POOL_CHECKED_OUT, \
+    DB_POOL_OVERFLOW, DB_POOL_SIZE
+
+SLOW_QUERY_SECONDS = 0.2        # 超过这个耗时的 SQL 视为慢查询
+SLOW_QUERY_SAMPLE_RATE = 0.1    # 慢查询按比例采样写日志，总数在 db_slow_queries_total 中完整统计
+SLOW_QUERY_MAX_CHARS = 2000
+
+slow_query_logger = logging.getLogger("db.slow_query")
+
+
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    记录从连接池取连接的等待时间：池满时等待的时间会体现在这里，而不是混在 SQL 耗时里
+    引擎名取自 pool_logging_name，连接池重建(recreate)后依然保留
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            record_pool_wait(time.perf_counter() - start, self._orig_logging_name or "primary")
+
+
+def instrument_engine(async_engine, name: str = "primary"):
+    """
+    在引擎上注册 SQL 计时事件：每条 SQL 计入请求统计和全局直方图，慢查询采样写日志
+    代替 echo=True 逐条同步打印所有 SQL；同时登记连接池状态的采集
+    """
+    sync_engine = async_engine.sync_engine
+
+    @register_collector
+    def _collect_pool_stats():
+        pool = sync_engine.pool
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            DB_POOL_CHECKED_OUT.set(pool.checkedout(), name)
+            DB_POOL_OVERFLOW.set(pool.overflow(), name)
+            DB_POOL_SIZE.set(pool.size(), name)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        record_query(elapsed, name)
+        if elapsed >= SLOW_QUERY_SECONDS:
+            DB_SLOW_QUERIES.inc()
+            if random.random() < SLOW_QUERY_SAMPLE_RATE:
+                slow_query_logger.warning("slow query %.3fs [%s]: %s | params=%r", elapsed, name,
+                                          statement[:SLOW_QUERY_MAX_CHARS], parameters)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        # 出错的 SQL 不会触发 after_cursor_execute，把开始时间弹掉，避免和下一条 SQL 错位
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start"):
+            conn.info["query_start"].pop()
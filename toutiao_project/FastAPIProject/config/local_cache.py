@@ -0,0 +1,130 @@
+import fnmatch
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils.metrics import LOCAL_CACHE_LOOKUPS, LOCAL_CACHE_EVICTIONS, LOCAL_CACHE_ENTRIES, LOCAL_CACHE_BYTES, \
+    LOCAL_CACHE_CAPACITY_BYTES, register_collector
+
+LOCAL_CACHE_MAX_BYTES = 32 * 1024 * 1024   # 进程内缓存占用上限(按序列化后的字节数估算)
+LOCAL_CACHE_MAX_ENTRIES = 10000
+
+# 只缓存了 JSON 字节、还没有反序列化的条目的 value 占位
+RAW_ONLY = object()
+
+
+@dataclass
+class _Entry:
+    value: Any
+    size: int
+    expires_at: float
+    remote_expires_at: Optional[float]
+    raw: Optional[bytes] = None
+
+
+class LocalCache:
+    """
+    进程内 LRU + TTL 缓存，作为 Redis 前面的一级缓存
+    只缓存通过 add_rule 登记过的 key，每条规则有自己的本地 TTL
+    缓存的是反序列化后的对象(或直接拼进响应体的 JSON 字节)，调用方不能修改返回值
+    """
+
+    def __init__(self, max_bytes: int = LOCAL_CACHE_MAX_BYTES, max_entries: int = LOCAL_CACHE_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._rules: List[Tuple[str, int]] = []
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def add_rule(self, pattern: str, ttl: int):
+        """
+        登记可进入本地缓存的 key 模式(fnmatch 语法)及其本地 TTL(秒)
+        """
+        self._rules.append((pattern, ttl))
+
+    def ttl_for(self, key: str) -> Optional[int]:
+        for pattern, ttl in self._rules:
+            if fnmatch.fnmatchcase(key, pattern):
+                return ttl
+        return None
+
+    def get(self, key: str) -> Optional[_Entry]:
+        entry = self._data.get(key)
+        if entry is None:
+            # 没有登记规则的 key 永远不会进入本地缓存，不计入未命中，避免拉低命中率
+            if self.ttl_for(key) is not None:
+                self.misses += 1
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def set(self, key: str, value: Any, size: int, remote_ttl: Optional[float] = None, raw: Optional[bytes] = None) -> bool:
+        ttl = self.ttl_for(key)
+        if ttl is None or size > self.max_bytes:
+            return False
+        now = time.monotonic()
+        remote_expires_at = None
+        if remote_ttl is not None:
+            # 本地副本不能比 Redis 中的值活得更久
+            ttl = min(ttl, remote_ttl)
+            remote_expires_at = now + remote_ttl
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = _Entry(value, size, now + ttl, remote_expires_at, raw)
+        self._bytes += size
+        while self._data and (self._bytes > self.max_bytes or len(self._data) > self.max_entries):
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+        return True
+
+    def delete(self, key: str):
+        if key in self._data:
+            self._remove(key)
+
+    def delete_pattern(self, pattern: str):
+        for key in [key for key in self._data if fnmatch.fnmatchcase(key, pattern)]:
+            self._remove(key)
+
+    def clear(self):
+        self._data.clear()
+        self._bytes = 0
+
+    def _remove(self, key: str):
+        entry = self._data.pop(key)
+        self._bytes -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+local_cache = LocalCache()
+
+
+@register_collector
+def _collect_local_cache_stats():
+    stats = local_cache.stats()
+    LOCAL_CACHE_LOOKUPS.set(stats["hits"], "hit")
+    LOCAL_CACHE_LOOKUPS.set(stats["misses"], "miss")
+    LOCAL_CACHE_EVICTIONS.set(stats["evictions"])
+    LOCAL_CACHE_ENTRIES.set(stats["entries"])
+    LOCAL_CACHE_BYTES.set(stats["bytes"])
+    LOCAL_CACHE_CAPACITY_BYTES.set(stats["max_bytes"])
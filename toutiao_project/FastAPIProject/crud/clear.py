@@ -0,0 +1,99 @@
+import asyncio
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config.db_conf import after_commit
+from models.favorite import Favorite
+from models.history import History
+from models.users import UserDataClearMark
+from utils.sql import upsert
+
+# 可清空的数据：类型 -> (表, 时间列, 当前时间)；浏览时间为本地时间，收藏时间为 UTC，标记与各自的列保持一致
+CLEAR_TARGETS = {
+    "history": (History, History.view_time, datetime.now),
+    "favorite": (Favorite, Favorite.created_at, datetime.utcnow),
+}
+# 没有清空标记时用于比较的最早时间
+_NO_MARK = datetime(1970, 1, 1)
+
+# 后台删除任务在这个事件上等待，标记提交后立即唤醒
+clear_requested = asyncio.Event()
+
+
+def visible_rows(kind:str,user_id):
+    """
+    读取条件：只保留晚于用户清空时间的记录；user_id 可以是具体的值，也可以是外层查询的列(关联子查询)
+    标记按主键查询，和主查询在同一条 SQL 中执行；标记和时间列都精确到微秒，同一秒内清空后的新记录不会被隐藏
+    """
+    model, time_column, _ = CLEAR_TARGETS[kind]
+    cleared_before = (select(UserDataClearMark.cleared_before)
+                      .where(UserDataClearMark.user_id == user_id,UserDataClearMark.kind == kind)
+                      .scalar_subquery())
+    return time_column > func.coalesce(cleared_before,_NO_MARK)
+
+
+async def get_clear_marks(db:AsyncSession,kind:str,user_ids) -> Dict[int,datetime]:
+    """
+    一批用户的清空时间 user_id -> cleared_before，没有清空过的用户不在结果中
+    """
+    stmt = select(UserDataClearMark.user_id,UserDataClearMark.cleared_before).where(
+        UserDataClearMark.user_id.in_(user_ids),UserDataClearMark.kind == kind)
+    return dict((await db.execute(stmt)).all())
+
+
+async def mark_cleared(db:AsyncSession,user_id:int,kind:str):
+    """
+    记录清空时间并立即返回，数据由后台任务分批删除；重复清空只推迟标记时间
+    """
+    _, _, now = CLEAR_TARGETS[kind]
+    cleared_before = now()
+    stmt = upsert(db.bind.dialect.name,UserDataClearMark.__table__,
+                  {"user_id":user_id,"kind":kind,"cleared_before":cleared_before,"purged":False},
+                  ["user_id","kind"],
+                  lambda new: {"cleared_before":new.cleared_before,"purged":new.purged})
+    await db.execute(stmt)
+    after_commit(db,_notify_clear_worker)
+    return cleared_before
+
+
+async def _notify_clear_worker():
+    clear_requested.set()
+
+
+async def get_pending_clear_marks(db:AsyncSession,limit:int = 100):
+    stmt = (select(UserDataClearMark.user_id,UserDataClearMark.kind,UserDataClearMark.cleared_before)
+            .where(UserDataClearMark.purged.is_(False))
+            .limit(limit))
+    result = await db.execute(stmt)
+    return result.all()
+
+
+async def purge_cleared_batch(db:AsyncSession,user_id:int,kind:str,cleared_before:datetime,batch_size:int):
+    """
+    删除一批不晚于清空时间的记录，返回 (取出的主键数, 删除条数)；先按 (user_id, 时间) 索引取主键，再按主键删除，锁范围只有这一批
+    取出的主键数小于 batch_size 说明已经删完
+    """
+    model, time_column, _ = CLEAR_TARGETS[kind]
+    ids_query = (select(model.id)
+                 .where(model.user_id == user_id,time_column <= cleared_before)
+                 .limit(batch_size))
+    ids = (await db.execute(ids_query)).scalars().all()
+    if not ids:
+        return 0, 0
+    # 选出主键到删除之间可能有重新浏览/收藏把时间更新到清空之后，删除时再检查一次时间
+    result = await db.execute(delete(model).where(model.id.in_(ids),time_column <= cleared_before))
+    return len(ids), result.rowcount
+
+
+async def finish_clear_mark(db:AsyncSession,user_id:int,kind:str,cleared_before:datetime):
+    """
+    删除完毕后置 purged；期间用户又清空过一次(标记时间变了)则保持待处理
+    """
+    stmt = (update(UserDataClearMark)
+            .where(UserDataClearMark.user_id == user_id,UserDataClearMark.kind == kind,
+                   UserDataClearMark.cleared_before == cleared_before)
+            .values(purged=True))
+    await db.execute(stmt)
@@ -1,9 +1,16 @@
+from typing import Dict, List
+
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete,func
-from models.favorite import Favorite
+from sqlalchemy import select, delete,func,or_,and_
 
+from cache.favorite_cache import check_cached_favorites, load_cached_favorites, add_cached_favorite, \
+    remove_cached_favorite, clear_cached_favorites, get_favorite_version
+from config.db_conf import after_commit
+from crud.clear import visible_rows, mark_cleared
 from models.favorite import Favorite
+from crud.news import news_card_only
 from models.news import News
+from utils.pagination import decode_cursor
 
 
 async def is_news_favorite(
@@ -11,19 +18,41 @@ async def is_news_favorite(
         user_id: int,
         news_id: int
 ):
-    query = select(Favorite).where(Favorite.user_id == user_id).where(Favorite.news_id == news_id)
+    flags = await get_favorite_flags(db,user_id,[news_id])
+    return flags[news_id]
+
+async def get_favorite_flags(
+        db: AsyncSession,
+        user_id: int,
+        news_ids: List[int]
+) -> Dict[int,bool]:
+    """
+    批量查询收藏状态：读取用户的收藏集合，集合未加载时从收藏表整体加载一次
+    """
+    flags = await check_cached_favorites(user_id,news_ids)
+    if flags is not None:
+        return flags
+    # 先记下写入版本再查库，查库期间有增删时不用这份快照覆盖集合
+    version = await get_favorite_version(user_id)
+    query = select(Favorite.news_id).where(Favorite.user_id == user_id,visible_rows("favorite",user_id))
     result = await db.execute(query)
-    return result.scalar_one_or_none() is not None
+    favorite_ids = set(result.scalars().all())
+    if version is not None:
+        await load_cached_favorites(user_id,version,favorite_ids)
+    return {news_id:news_id in favorite_ids for news_id in news_ids}
 
 async def add_news_favorite(
         db: AsyncSession,
         user_id: int,
         news_id: int
 ):
+    # 清空后尚未被后台删除的同一条收藏仍占着唯一约束，先删掉它
+    await db.execute(delete(Favorite).where(Favorite.user_id == user_id,Favorite.news_id == news_id,
+                                            ~visible_rows("favorite",user_id)))
     favorite = Favorite(user_id=user_id,news_id=news_id)
     db.add(favorite)
-    await db.commit()
-    await db.refresh(favorite)
+    await db.flush()
+    after_commit(db,lambda: add_cached_favorite(user_id,news_id))
     return favorite
 
 async def remove_news_favorite(
@@ -31,9 +60,10 @@ async def remove_news_favorite(
         user_id: int,
         news_id: int
 ):
-    stmt = delete(Favorite).where(Favorite.user_id == user_id,Favorite.news_id == news_id)
+    stmt = delete(Favorite).where(Favorite.user_id == user_id,Favorite.news_id == news_id,
+                                  visible_rows("favorite",user_id))
     result = await db.execute(stmt)
-    await db.commit()
+    after_commit(db,lambda: remove_cached_favorite(user_id,news_id))
     return result.rowcount>0
 
 async def get_favorite_list(
@@ -43,24 +73,53 @@ async def get_favorite_list(
         page_size: int = 10
 ):
     offset = (page-1)*page_size
-    count_query = select(func.count()).where(Favorite.user_id == user_id)
+    count_query = select(func.count()).where(Favorite.user_id == user_id,visible_rows("favorite",user_id))
     count_result = await db.execute(count_query)
     total = count_result.scalar_one()
     query = (select(News,Favorite.created_at.label("favorite_time"),Favorite.id.label("favorite_id"))
+             .options(news_card_only())
              .join(Favorite,Favorite.news_id == News.id)
-             .where(Favorite.user_id == user_id)
-             .order_by(Favorite.created_at.desc())
+             .where(Favorite.user_id == user_id,visible_rows("favorite",user_id))
+             .order_by(Favorite.created_at.desc(),Favorite.id.desc())
              .offset(offset).limit(page_size)
              )
     result = await db.execute(query)
     rows = result.all()
     return rows,total
 
+async def get_favorite_list_by_cursor(
+        db: AsyncSession,
+        user_id: int,
+        cursor: str,
+        page_size: int = 10
+):
+    """
+    游标分页获取收藏列表，按 (created_at, id) 倒序，多取一条判断是否还有下一页
+    """
+    created_at, last_id = decode_cursor(cursor)
+    count_query = select(func.count()).where(Favorite.user_id == user_id,visible_rows("favorite",user_id))
+    count_result = await db.execute(count_query)
+    total = count_result.scalar_one()
+    query = (select(News,Favorite.created_at.label("favorite_time"),Favorite.id.label("favorite_id"))
+             .options(news_card_only())
+             .join(Favorite,Favorite.news_id == News.id)
+             .where(Favorite.user_id == user_id,visible_rows("favorite",user_id))
+             .where(or_(Favorite.created_at < created_at,
+                        and_(Favorite.created_at == created_at,Favorite.id < last_id)))
+             .order_by(Favorite.created_at.desc(),Favorite.id.desc())
+             .limit(page_size+1)
+             )
+    result = await db.execute(query)
+    rows = result.all()
+    return rows[:page_size],total,len(rows) > page_size
+
 async def remove_all_favorites(
         db: AsyncSession,
         user_id: int
 ):
-    stmt = delete(Favorite).where(Favorite.user_id == user_id)
-    result = await db.execute(stmt)
-    await db.commit()
-    return result.rowcount or 0
\ No newline at end of file
+    """
+    清空收藏：只登记清空时间，之前的收藏立即对读取隐藏，由后台任务分批删除
+    """
+    cleared_before = await mark_cleared(db,user_id,"favorite")
+    after_commit(db,lambda: clear_cached_favorites(user_id))
+    return cleared_before
@@ -1,42 +1,102 @@
-from datetime import datetime
+from collections import defaultdict
+from typing import Any, Dict, List
 
-from sqlalchemy import select, func, delete
+from sqlalchemy import select, func, delete, or_, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from cache.history_cache import HISTORY_RECENT_SIZE, get_cached_history_page, get_cached_history_total, \
+    get_history_version, \
+    load_cached_history, add_cached_history, remove_cached_history, clear_cached_history
+from config.db_conf import after_commit, AsyncReadOnlySessionLocal
+from crud.clear import visible_rows, mark_cleared, get_clear_marks
 from models.history import History
+from crud.news import news_card_only
 from models.news import News
+from utils.pagination import decode_cursor
+from utils.sql import upsert
 
 
-async def add_history(db: AsyncSession, user_id: int, news_id: int):
+async def add_history_batch(db: AsyncSession, rows: List[Dict[str, Any]]):
     """
-    添加历史记录
+    批量写入历史记录，已存在的 (user_id, news_id) 只更新浏览时间
     """
-    query = select(History).where(History.user_id == user_id, History.news_id == news_id)
-    result = await db.execute(query)
-    existing_history = result.scalar_one_or_none()
-    if existing_history:
-        existing_history.view_time = datetime.now()
-        await db.commit()
-        await db.refresh(existing_history)
-        return existing_history
-    else:
-        history = History(user_id=user_id, news_id=news_id)
-        db.add(history)
-        await db.commit()
-        await db.refresh(history)
-        return history
+    if not rows:
+        return
+    # 先查出已存在(且未被清空)的记录，提交后缓存里的总数只加真正新增的条数
+    existing_query = select(History.user_id, History.news_id).where(
+        History.user_id.in_({row["user_id"] for row in rows}),
+        History.news_id.in_({row["news_id"] for row in rows}),
+        visible_rows("history", History.user_id))
+    existing = set((await db.execute(existing_query)).all())
+    # 清空之前产生、刷写时才写入的浏览记录落在清空时间之前，读取时会被隐藏，不能再加回缓存
+    marks = await get_clear_marks(db, "history", {row["user_id"] for row in rows})
+    entries = defaultdict(list)
+    for row in rows:
+        cleared_before = marks.get(row["user_id"])
+        if cleared_before is not None and row["view_time"] <= cleared_before:
+            continue
+        entries[row["user_id"]].append((row["news_id"], row["view_time"].timestamp(),
+                                        (row["user_id"], row["news_id"]) not in existing))
+    after_commit(db, lambda: add_cached_history(entries))
+
+    stmt = upsert(db.bind.dialect.name, History.__table__, rows, ["user_id", "news_id"],
+                  lambda new: {"view_time": new.view_time})
+    await db.execute(stmt)
+
+
+async def _load_recent_history(user_id: int):
+    """
+    从数据库加载总数和最近 HISTORY_RECENT_SIZE 条浏览记录，写入缓存，返回 (新闻ID列表, 总数)
+    缓存要保存一整天，从主库读取而不是可能延迟的副本；读取前记下写入版本，期间有写入则不写缓存
+    """
+    version = await get_history_version(user_id)
+    async with AsyncReadOnlySessionLocal() as session:
+        count_query = select(func.count(History.id)).where(History.user_id == user_id,
+                                                           visible_rows("history", user_id))
+        total = (await session.execute(count_query)).scalar_one()
+        recent_query = (select(History.news_id, History.view_time)
+                        .where(History.user_id == user_id, visible_rows("history", user_id))
+                        .order_by(History.view_time.desc(), History.id.desc())
+                        .limit(HISTORY_RECENT_SIZE))
+        recent = (await session.execute(recent_query)).all()
+    if version is not None:
+        await load_cached_history(user_id, version, total,
+                                  [(news_id, view_time.timestamp()) for news_id, view_time in recent])
+    return [news_id for news_id, _ in recent], total
 
 
 async def get_history_list(db: AsyncSession, user_id: int, page: int = 1, page_size: int = 10):
+    """
+    前几页和总数从 Redis 中最近浏览列表读取，再按 (user_id, news_id) 取这一页的记录和新闻卡片；
+    超出最近列表范围的深翻页才走数据库 OFFSET 查询
+    """
     offset = (page - 1) * page_size
-    count_query = select(func.count(History.id)).where(History.user_id == user_id)
-    count_result = await db.execute(count_query)
-    total = count_result.scalar_one()
+    cached = await get_cached_history_page(user_id, offset, offset + page_size - 1)
+    if cached is None:
+        recent_ids, total = await _load_recent_history(user_id)
+        if offset + page_size <= len(recent_ids) or len(recent_ids) >= total:
+            cached = recent_ids[offset:offset + page_size], total
+        else:
+            cached = None, total
+    news_ids, total = cached
+
+    if news_ids is not None:
+        if not news_ids:
+            return [], total
+        query = (select(News, History.view_time.label("view_time"), History.id.label("history_id"))
+                 .options(news_card_only())
+                 .join(History, History.news_id == News.id)
+                 .where(History.user_id == user_id, History.news_id.in_(news_ids),
+                        visible_rows("history", user_id)))
+        rows = (await db.execute(query)).all()
+        rows.sort(key=lambda row: (row.view_time, row.history_id), reverse=True)
+        return rows, total
 
     query = (select(News, History.view_time.label("view_time"), History.id.label("history_id"))
+             .options(news_card_only())
              .join(History, History.news_id == News.id)
-             .where(History.user_id == user_id)
-             .order_by(History.view_time.desc())
+             .where(History.user_id == user_id, visible_rows("history", user_id))
+             .order_by(History.view_time.desc(), History.id.desc())
              .offset(offset).limit(page_size))
 
     result = await db.execute(query)
@@ -44,23 +104,52 @@ async def get_history_list(db: AsyncSession, user_id: int, page: int = 1, page_s
     return rows, total
 
 
+async def count_history(db: AsyncSession, user_id: int):
+    total = await get_cached_history_total(user_id)
+    if total is None:
+        count_query = select(func.count(History.id)).where(History.user_id == user_id,
+                                                       visible_rows("history", user_id))
+        total = (await db.execute(count_query)).scalar_one()
+    return total
+
+
+async def get_history_list_by_cursor(db: AsyncSession, user_id: int, cursor: str, page_size: int = 10):
+    """
+    游标分页获取历史记录，按 (view_time, id) 倒序，多取一条判断是否还有下一页
+    """
+    view_time, last_id = decode_cursor(cursor)
+    total = await count_history(db, user_id)
+
+    query = (select(News, History.view_time.label("view_time"), History.id.label("history_id"))
+             .options(news_card_only())
+             .join(History, History.news_id == News.id)
+             .where(History.user_id == user_id, visible_rows("history", user_id))
+             .where(or_(History.view_time < view_time,
+                        and_(History.view_time == view_time, History.id < last_id)))
+             .order_by(History.view_time.desc(), History.id.desc())
+             .limit(page_size + 1))
+
+    result = await db.execute(query)
+    rows = result.all()
+    return rows[:page_size], total, len(rows) > page_size
+
+
 async def delete_history(db: AsyncSession, user_id: int, news_id: int):
     """
     删除历史记录
     """
-    query = delete(History).where(History.user_id == user_id, History.news_id == news_id)
+    query = delete(History).where(History.user_id == user_id, History.news_id == news_id,
+                                  visible_rows("history", user_id))
     result = await db.execute(query)
-    await db.commit()
-
+    if result.rowcount > 0:
+        after_commit(db, lambda: remove_cached_history(user_id, news_id))
     return result.rowcount > 0
 
 
 async def clear_history(db: AsyncSession, user_id: int):
     """
-    清空历史记录
+    清空历史记录：只登记清空时间，之前的记录立即对读取隐藏，由后台任务分批删除
     """
-    query = delete(History).where(History.user_id == user_id)
-    result = await db.execute(query)
-    await db.commit()
-
-    return result.rowcount or 0
\ No newline at end of file
+    cleared_before = await mark_cleared(db, user_id, "history")
+    after_commit(db, lambda: clear_cached_history(user_id))
+    return cleared_before
@@ -1,10 +1,26 @@
 from fastapi.encoders import jsonable_encoder
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select,func,update
+import time
+from datetime import datetime
+from typing import Dict, Optional
 
-from cache.news_cache import get_cached_categories, set_cache_categories, get_cache_news_list, set_cache_news_list
-from models.news import Category, News
+from sqlalchemy import select,func,update,case,or_,and_
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.orm import load_only
+
+from cache.news_cache import get_cached_categories, set_cache_categories, \
+    get_or_load_news_page_json, get_cache_news_page, get_news_version, bump_news_versions, evict_cached_categories, \
+    get_cached_news_count, set_cache_news_count, incr_cached_news_count, get_cached_related_news, \
+    set_cache_related_news
+from cache.news_access import record_news_list_access
+from cache.news_views import incr_news_views
+from cache.trending_cache import record_trending_view, get_trending_news_ids, get_or_load_hot_news
+from config.db_conf import AsyncSessionLocal
+from crud.news_hooks import on_news_committed, NewsChanges
+from models.news import Category, News, NewsCategoryCounter
 from schemas.base import NewsItemBase
+from utils.pagination import decode_cursor, next_cursor
+from utils.sql import upsert
 
 
 async def get_categories(db:AsyncSession,skip: int = 0, limit: int = 100):
@@ -20,25 +36,180 @@ async def get_categories(db:AsyncSession,skip: int = 0, limit: int = 100):
     return categories
 
 
-async def get_news_list(db:AsyncSession,category_id:int,skip: int = 0, limit: int = 100):
+# 列表卡片用到的列，列表类查询只加载这些列，不读取 content 大字段
+NEWS_CARD_COLUMNS = (News.id, News.title, News.description, News.image, News.author,
+                     News.category_id, News.views, News.publish_time)
+
+
+def news_card_only():
+    """
+    列表投影：只加载卡片列，误访问 content 时直接报错而不是触发额外查询
+    """
+    return load_only(*NEWS_CARD_COLUMNS, raiseload=True)
+
+
+def _news_list_loader(category_id:int,skip:int,limit:int):
+    async def load_news_list():
+        # 回源可能由多个请求共享或在后台提前刷新，使用独立会话而不是请求内的 db
+        async with AsyncSessionLocal() as session:
+            # 多取一条判断是否还有下一页，hasMore/nextCursor 和列表一起缓存，命中时不用再解析列表
+            stmt = (select(News).options(news_card_only()).where(News.category_id == category_id)
+                    .order_by(News.publish_time.desc(),News.id.desc())
+                    .offset(skip).limit(limit+1))
+            result = await session.execute(stmt)
+            rows = result.scalars().all()
+            news_list = rows[:limit]
+            has_more = len(rows) > limit
+            last = news_list[-1] if news_list else None
+            return {
+                "list": [NewsItemBase.model_validate(item).model_dump(mode="json",by_alias=False) for item in news_list],
+                "hasMore": has_more,
+                "nextCursor": next_cursor(last.publish_time,last.id,has_more) if last else None,
+            }
+    return load_news_list
+
+
+async def get_news_page(db:AsyncSession,category_id:int,skip: int = 0, limit: int = 100,record_access: bool = True):
+    """
+    列表页和总数一起取：一次 Redis 往返读出两个 key，只有未命中的部分才回源
+    列表页以 JSON 字节返回({"list","hasMore","nextCursor"})，命中缓存时不经过 ORM 对象和重新编码
+    record_access 为 False 时不计入访问统计(缓存预热调用，避免预热目标自我强化)
+    返回 (列表页JSON字节, 总数)
+    """
     page=skip//limit+1
-    cache_list = await get_cache_news_list(category_id,page,limit)
-    if cache_list:
-        return [News(**item) for item in cache_list]
+    if record_access:
+        record_news_list_access(category_id,page,limit)
+    version = await get_news_version(category_id)
+    cached_page, cached_count = await get_cache_news_page(category_id,version,page,limit)
+    page_json = await get_or_load_news_page_json(category_id,version,page,limit,_news_list_loader(category_id,skip,limit),
+                                                 prefetched=cached_page)
+    total = cached_count if cached_count is not None else await get_news_count(db,category_id)
+    return page_json, total
+
 
-    stmt = select(News).where(News.category_id == category_id).offset(skip).limit(limit)
+async def get_news_list_by_cursor(db:AsyncSession,category_id:int,cursor:str,limit: int = 10):
+    """
+    游标分页：按 (publish_time, id) 倒序从上一页最后一条之后继续取，深翻页不再扫描丢弃前面的行
+    多取一条用来判断是否还有下一页
+    """
+    publish_time, last_id = decode_cursor(cursor)
+    stmt = (select(News)
+            .options(news_card_only())
+            .where(News.category_id == category_id)
+            .where(or_(News.publish_time < publish_time,
+                       and_(News.publish_time == publish_time,News.id < last_id)))
+            .order_by(News.publish_time.desc(),News.id.desc())
+            .limit(limit+1))
     result = await db.execute(stmt)
     news_list = result.scalars().all()
-    if news_list:
-        news_data = [NewsItemBase.model_validate(item).model_dump(mode="json",by_alias=False) for item in news_list]
-        await set_cache_news_list(category_id,page,limit,news_data)
-    return news_list
+    return news_list[:limit], len(news_list) > limit
+
+
+SEARCH_MIN_KEYWORD_LENGTH = 2     # MySQL ngram_token_size 默认为 2，单个字搜不到结果
+SEARCH_MAX_KEYWORD_LENGTH = 50
+
+
+def _search_score(dialect_name:str,keyword:str):
+    """
+    相关度分数：MySQL 使用 FULLTEXT(ngram) 索引的 MATCH ... AGAINST，InnoDB 按 BM25 类算法打分，
+    新增/修改的新闻由 MySQL 增量维护索引；其他数据库(本地 sqlite 压测)退回 LIKE，按命中的字段加权
+    """
+    if dialect_name == "mysql":
+        return match(News.title,News.description,News.content,against=keyword).in_natural_language_mode()
+    pattern = "%" + keyword.replace("\\","\\\\").replace("%","\\%").replace("_","\\_") + "%"
+    return (case((News.title.like(pattern,escape="\\"),3),else_=0)
+            + case((News.description.like(pattern,escape="\\"),2),else_=0)
+            + case((News.content.like(pattern,escape="\\"),1),else_=0))
+
+
+async def search_news(db:AsyncSession,keyword:str,category_id:int = None,cursor:str = None,limit: int = 10):
+    """
+    全文搜索标题、简介和正文，按 (相关度, id) 倒序，游标中记录上一页最后一条的分数和 id
+    不统计总数(全文检索的 COUNT 代价和检索本身相当)，多取一条判断是否还有下一页
+    返回 ([(新闻, 分数)], 是否还有下一页)
+    """
+    score = _search_score(db.bind.dialect.name,keyword)
+    stmt = select(News,score.label("score")).options(news_card_only()).where(score > 0)
+    if category_id is not None:
+        stmt = stmt.where(News.category_id == category_id)
+    if cursor:
+        last_score, last_id = decode_cursor(cursor,float)
+        stmt = stmt.where(or_(score < last_score,and_(score == last_score,News.id < last_id)))
+    stmt = stmt.order_by(score.desc(),News.id.desc()).limit(limit+1)
+    result = await db.execute(stmt)
+    rows = result.all()
+    return rows[:limit], len(rows) > limit
 
 
 async def get_news_count(db:AsyncSession,category_id:int):
-    stmt = select(func.count(News.id)).where(News.category_id == category_id)
+    """
+    分类新闻总数：Redis -> 计数表 -> COUNT(*)，缓存命中时不访问数据库
+    """
+    cached_count = await get_cached_news_count(category_id)
+    if cached_count is not None:
+        return cached_count
+
+    stmt = select(NewsCategoryCounter.news_count).where(NewsCategoryCounter.category_id == category_id)
     result = await db.execute(stmt)
-    return result.scalar_one()
+    count = result.scalar_one_or_none()
+    if count is None:
+        stmt = select(func.count(News.id)).where(News.category_id == category_id)
+        result = await db.execute(stmt)
+        count = result.scalar_one()
+        # db 可能是只读副本的会话，计数行用独立的主库会话初始化
+        async with AsyncSessionLocal() as session:
+            await save_news_counts(session,{category_id:count})
+            await session.commit()
+    await set_cache_news_count(category_id,count)
+    return count
+
+
+async def save_news_counts(db:AsyncSession,counts:Dict[int,int]):
+    """
+    写入分类计数的绝对值（初始化或校准），不存在则插入
+    """
+    if not counts:
+        return
+    now = datetime.now()
+    stmt = upsert(
+        db.bind.dialect.name,
+        NewsCategoryCounter.__table__,
+        [{"category_id":category_id,"news_count":count,"created_at":now,"updated_at":now}
+         for category_id,count in counts.items()],
+        ["category_id"],
+        lambda new: {"news_count":new.news_count,"updated_at":new.updated_at},
+    )
+    await db.execute(stmt)
+
+
+async def reconcile_news_counts(db:AsyncSession):
+    """
+    按 COUNT(*) 校准所有分类的计数，兜底批量语句等绕过 ORM 事件的增删
+    """
+    stmt = select(News.category_id,func.count(News.id)).group_by(News.category_id)
+    result = await db.execute(stmt)
+    counts = {category_id:count for category_id,count in result.all()}
+    # 新闻被删光的分类不会出现在 GROUP BY 结果里，计数归零
+    stmt = select(NewsCategoryCounter.category_id)
+    result = await db.execute(stmt)
+    for category_id in result.scalars().all():
+        counts.setdefault(category_id,0)
+    await save_news_counts(db,counts)
+    return counts
+
+
+@on_news_committed
+async def _sync_cached_news_counts(changes:NewsChanges):
+    for category_id,delta in changes.count_deltas.items():
+        if delta:
+            await incr_cached_news_count(category_id,delta)
+
+@on_news_committed
+async def _invalidate_cached_news_lists(changes:NewsChanges):
+    # 列表 key 带版本号，版本号一变旧页面就不可达，不需要逐个删除
+    await bump_news_versions(changes.categories)
+    if changes.categories_changed:
+        await evict_cached_categories()
 
 async def get_news_detail(db:AsyncSession,news_id:int):
     stmt = select(News).where(News.id == news_id)
@@ -47,17 +218,65 @@ async def get_news_detail(db:AsyncSession,news_id:int):
 
 
 async def increase_news_views(db:AsyncSession,news_id:int):
-    stmt=update(News).where(News.id == news_id).values(views=News.views+1)
-    result=await db.execute(stmt)
-    await db.commit()
+    """
+    浏览量 +1，返回数据库中还没有体现的浏览次数，详情接口用它拼出实时浏览量
+    正常情况下只在 Redis 中累加，由后台任务批量写回；Redis 不可用时退回直接更新数据库
+    """
+    buffered = await incr_news_views(news_id)
+    if buffered is not None:
+        return buffered
+
+    # 详情接口的 db 可能连的是只读副本，直接写库时使用主库会话
+    async with AsyncSessionLocal() as session:
+        stmt=update(News).where(News.id == news_id).values(views=News.views+1)
+        result=await session.execute(stmt)
+        await session.commit()
+
+    return 1 if result.rowcount > 0 else 0
+
+
+FLUSH_VIEWS_BATCH_SIZE = 500
+
+
+async def flush_news_views(db:AsyncSession,deltas:Dict[int,int]):
+    """
+    批量写回浏览量增量：UPDATE news SET views = views + CASE id WHEN ... END WHERE id IN (...)
+    """
+    items = list(deltas.items())
+    for start in range(0,len(items),FLUSH_VIEWS_BATCH_SIZE):
+        batch = dict(items[start:start+FLUSH_VIEWS_BATCH_SIZE])
+        stmt = (update(News)
+                .where(News.id.in_(batch.keys()))
+                .values(views=News.views + case(batch,value=News.id,else_=0))
+                .execution_options(synchronize_session=False))
+        await db.execute(stmt)
 
-    return result.rowcount > 0
 
+RELATED_NEWS_LIMIT = 5
+# 相关新闻缓存的最大陈旧时间(秒)，超过后详情页回源查询
+RELATED_NEWS_MAX_STALENESS = 900
 
-async def get_related_news(db:AsyncSession,news_id:int,category_id:int,limit: int = 5):
-    stmt = select(News).where(
-        News.category_id == category_id,
-        News.id != news_id
+
+async def get_related_news(db:AsyncSession,news_id:int,category_id:int,limit: int = RELATED_NEWS_LIMIT):
+    """
+    相关新闻：读取后台任务预先算好的分类浏览量榜单，过滤掉当前新闻
+    缓存缺失或超过陈旧上限时回源查询，并顺带回填缓存
+    """
+    candidates, refreshed_at = await get_cached_related_news(category_id)
+    stale = candidates is None or time.time() - refreshed_at > RELATED_NEWS_MAX_STALENESS
+    if stale or limit > RELATED_NEWS_LIMIT:
+        candidates = await load_related_candidates(db,category_id,max(limit,RELATED_NEWS_LIMIT) + 1)
+        if limit <= RELATED_NEWS_LIMIT:
+            await set_cache_related_news(category_id,candidates)
+    return [item for item in candidates if item["id"] != news_id][:limit]
+
+
+async def load_related_candidates(db:AsyncSession,category_id:int,limit: int = RELATED_NEWS_LIMIT + 1):
+    """
+    分类内按浏览量取前 limit 条，多取一条保证过滤掉当前新闻后仍有足够数量
+    """
+    stmt = select(News).options(news_card_only()).where(
+        News.category_id == category_id
     ).order_by(
         News.views.desc(),
     News.publish_time.desc()
@@ -65,14 +284,44 @@ async def get_related_news(db:AsyncSession,news_id:int,category_id:int,limit: in
     result = await db.execute(stmt)
     related_news= result.scalars().all()
 
-    return [{
+    return jsonable_encoder([{
     "id": news_detail.id,
     "title": news_detail.title,
-    "content": news_detail.content,
     "image": news_detail.image,
     "author": news_detail.author,
     "publishTime": news_detail.publish_time,
     "categoryId": news_detail.category_id,
     "views": news_detail.views
-    } for news_detail in related_news]
+    } for news_detail in related_news])
+
+
+HOT_NEWS_MAX_LIMIT = 50
+
+
+async def record_news_view(news_id:int,category_id:int):
+    """
+    详情页浏览事件：计入全站和分类的热度榜
+    """
+    await record_trending_view(news_id,category_id)
+
+
+def _hot_news_loader(category_id:Optional[int],limit:int):
+    async def load_hot_news():
+        news_ids = await get_trending_news_ids(category_id,limit)
+        if not news_ids:
+            return []
+        # 回源可能由多个请求共享，使用独立会话；按主键取卡片列，再按榜单顺序排列，已删除的新闻自然被过滤
+        async with AsyncSessionLocal() as session:
+            stmt = select(News).options(news_card_only()).where(News.id.in_(news_ids))
+            result = await session.execute(stmt)
+            news_by_id = {item.id:item for item in result.scalars().all()}
+        return [NewsItemBase.model_validate(news_by_id[news_id]).model_dump(mode="json",by_alias=False)
+                for news_id in news_ids if news_id in news_by_id]
+    return load_hot_news
+
 
+async def get_hot_news(category_id:Optional[int],limit:int = 10):
+    """
+    热榜：category_id 为 None 时是全站榜，结果短时间缓存
+    """
+    return await get_or_load_hot_news(category_id,limit,_hot_news_loader(category_id,limit)) or []
@@ -0,0 +1,113 @@
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Set
+
+from sqlalchemy import event, inspect, update
+from sqlalchemy.orm import Session
+
+from models.news import Category, News, NewsCategoryCounter
+
+_CHANGES_KEY = "news_changes"
+
+
+@dataclass
+class NewsChanges:
+    """
+    一次事务内新闻的变化：各分类新闻数的增减，有新闻被新增/修改/删除的分类，以及分类本身是否有增删改
+    """
+    count_deltas: Dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    categories: Set[int] = field(default_factory=set)
+    categories_changed: bool = False
+
+
+NewsChangeCallback = Callable[[NewsChanges], Awaitable]
+_callbacks: List[NewsChangeCallback] = []
+# 持有回调任务的引用，防止任务被垃圾回收
+_pending_tasks: Set[asyncio.Task] = set()
+
+
+def on_news_committed(callback: NewsChangeCallback):
+    """
+    注册新闻变化的提交后回调（更新缓存等），只在事务提交成功后调用
+    只能感知通过 ORM 对象增删改的新闻，批量 UPDATE/DELETE 语句需由定时校准兜底
+    """
+    _callbacks.append(callback)
+    return callback
+
+
+def _changes(session: Session) -> NewsChanges:
+    return session.info.setdefault(_CHANGES_KEY, NewsChanges())
+
+
+def _bump_counter(connection, category_id: int, delta: int):
+    """
+    在同一个事务里调整分类计数；计数行还不存在时跳过，首次读取时会用 COUNT(*) 初始化
+    """
+    stmt = (update(NewsCategoryCounter)
+            .where(NewsCategoryCounter.category_id == category_id)
+            .values(news_count=NewsCategoryCounter.news_count + delta, updated_at=datetime.now()))
+    connection.execute(stmt)
+
+
+@event.listens_for(News, "after_insert")
+def _after_news_insert(mapper, connection, target: News):
+    changes = _changes(Session.object_session(target))
+    changes.count_deltas[target.category_id] += 1
+    changes.categories.add(target.category_id)
+    _bump_counter(connection, target.category_id, 1)
+
+
+@event.listens_for(News, "after_update")
+def _after_news_update(mapper, connection, target: News):
+    changes = _changes(Session.object_session(target))
+    history = inspect(target).attrs.category_id.history
+    if history.has_changes() and history.deleted:
+        # 新闻换了分类：旧分类 -1，新分类 +1
+        old_category_id = history.deleted[0]
+        changes.count_deltas[old_category_id] -= 1
+        changes.count_deltas[target.category_id] += 1
+        changes.categories.add(old_category_id)
+        _bump_counter(connection, old_category_id, -1)
+        _bump_counter(connection, target.category_id, 1)
+    changes.categories.add(target.category_id)
+
+
+@event.listens_for(News, "after_delete")
+def _after_news_delete(mapper, connection, target: News):
+    changes = _changes(Session.object_session(target))
+    changes.count_deltas[target.category_id] -= 1
+    changes.categories.add(target.category_id)
+    _bump_counter(connection, target.category_id, -1)
+
+
+@event.listens_for(Category, "after_insert")
+@event.listens_for(Category, "after_update")
+@event.listens_for(Category, "after_delete")
+def _after_category_change(mapper, connection, target: Category):
+    _changes(Session.object_session(target)).categories_changed = True
+
+
+async def _run_callback(callback: NewsChangeCallback, changes: NewsChanges):
+    try:
+        await callback(changes)
+    except Exception as e:
+        print(e)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session):
+    changes = session.info.pop(_CHANGES_KEY, None)
+    if changes is None or not _callbacks:
+        return
+    loop = asyncio.get_running_loop()
+    for callback in _callbacks:
+        task = loop.create_task(_run_callback(callback, changes))
+        _pending_tasks.add(task)
+        task.add_done_callback(_pending_tasks.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session):
+    session.info.pop(_CHANGES_KEY, None)
@@ -2,7 +2,10 @@ import datetime
 
 from fastapi import HTTPException,status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select,update
+from sqlalchemy import select,update,delete
+
+from cache.user_cache import get_cached_token_user, set_cache_token_user, evict_token_user
+from config.db_conf import after_commit
 from models.users import User, UserToken
 from schemas.users import UserRequest, UserUpdateRequest
 from utils import security
@@ -16,11 +19,10 @@ async def get_user_by_username(db:AsyncSession, username:str):
 
 
 async def create_user(db:AsyncSession, user_data:UserRequest):
-    hashed_password = security.get_hash_password(user_data.password)
+    hashed_password = await security.get_hash_password(user_data.password)
     user = User(username=user_data.username, password=hashed_password)
     db.add(user)
-    await db.commit()
-    await db.refresh(user)
+    await db.flush()
     return user
 
 
@@ -33,12 +35,15 @@ async def create_token(db:AsyncSession,user_id:int):
     user_token=result.scalars().one_or_none()
 
     if user_token:
+        # 旧令牌失效，提交后清掉它的用户缓存
+        old_token = user_token.token
+        after_commit(db,lambda: evict_token_user(old_token))
         user_token.token = token
         user_token.expires_at = expires_at
     else:
         user_token = UserToken(user_id=user_id, token=token, expires_at=expires_at)
         db.add(user_token)
-        await db.commit()
+    await db.flush()
 
     return token
 
@@ -47,22 +52,64 @@ async def authenticate_user(db:AsyncSession, username:str, password:str):
     user = await get_user_by_username(db, username)
     if not user:
         return None
-    if not security.verify_password(password, user.password):
+    valid, new_hash = await security.verify_and_update_password(password, user.password)
+    if not valid:
         return None
+    if new_hash:
+        # bcrypt 参数调整过，登录时顺带把哈希升级到新参数
+        user.password = new_hash
 
     return user
 
 
+# 缓存中不保存密码哈希，需要密码的地方(修改密码)从数据库重新加载用户
+USER_CACHE_FIELDS = ("id","username","nickname","avatar","gender","bio","phone")
+
+
 async def get_user_by_token(db:AsyncSession, token:str):
-    query = select(UserToken).where(UserToken.token == token)
+    """
+    令牌解析用户：先查缓存，未命中时用一条 JOIN 查询同时校验令牌和加载用户
+    缓存命中时返回的是未绑定会话的 User 对象，只包含 USER_CACHE_FIELDS
+    """
+    cached_user = await get_cached_token_user(token)
+    if cached_user is not None:
+        return User(**cached_user)
+
+    query = (select(User,UserToken.expires_at)
+             .join(UserToken,UserToken.user_id == User.id)
+             .where(UserToken.token == token,UserToken.expires_at >= datetime.datetime.now()))
     result = await db.execute(query)
-    db_token = result.scalars().one_or_none()
-    if not db_token or db_token.expires_at < datetime.datetime.now():
+    row = result.one_or_none()
+    if row is None:
         return None
 
-    query = select(User).where(User.id == db_token.user_id)
+    user, expires_at = row
+    await set_cache_token_user(token,{field:getattr(user,field) for field in USER_CACHE_FIELDS},expires_at)
+    return user
+
+
+async def evict_user_tokens(db:AsyncSession, user_id:int):
+    """
+    清除某个用户所有令牌的用户缓存（用户信息或密码变更后调用），在事务提交后执行
+    """
+    query = select(UserToken.token).where(UserToken.user_id == user_id)
     result = await db.execute(query)
-    return result.scalars().one_or_none()
+    tokens = result.scalars().all()
+
+    async def evict():
+        for token in tokens:
+            await evict_token_user(token)
+    after_commit(db,evict)
+
+
+async def delete_token(db:AsyncSession, token:str):
+    """
+    登出：删除令牌并立即清除缓存
+    """
+    query = delete(UserToken).where(UserToken.token == token)
+    result = await db.execute(query)
+    after_commit(db,lambda: evict_token_user(token))
+    return result.rowcount > 0
 
 
 async def update_user(db:AsyncSession, username:str,user_data:UserUpdateRequest):
@@ -71,21 +118,22 @@ async def update_user(db:AsyncSession, username:str,user_data:UserUpdateRequest)
         exclude_none=True,
     ))
     result=await db.execute(query)
-    await db.commit()
 
     if result.rowcount==0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,detail="User not found")
 
     updated_user = await get_user_by_username(db, username)
+    await evict_user_tokens(db, updated_user.id)
     return updated_user
 
 async def change_password(db:AsyncSession, user:User,old_password:str,new_password:str):
-    if not security.verify_password(old_password, user.password):
+    # 当前用户可能来自令牌缓存（不含密码），从数据库加载
+    user = await db.get(User, user.id)
+    if not user or not await security.verify_password(old_password, user.password):
         return False
 
-    hashed_new_pwd = security.get_hash_password(new_password)
+    hashed_new_pwd = await security.get_hash_password(new_password)
     user.password = hashed_new_pwd
-    db.add(user)
-    await db.commit()
-    await db.refresh(user)
+    await db.flush()
+    await evict_user_tokens(db, user.id)
     return True
\ No newline at end of file
@@ -1,10 +1,65 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from routers import news,users,favorite
+from fastapi.responses import PlainTextResponse, JSONResponse
+from routers import news,users,favorite,history
 from fastapi.middleware.cors import CORSMiddleware
 
+from cache.news_access import flush_news_list_access
+from config.cache_config import run_invalidation_listener
+from config.db_conf import read_engine, check_replica_lag, REPLICA_LAG_CHECK_INTERVAL
+from tasks.cache_warmer import run_cache_warmer, decay_news_access, NEWS_ACCESS_FLUSH_INTERVAL, \
+    NEWS_ACCESS_DECAY_INTERVAL, WARMUP_STATS
+from tasks.data_clear import run_data_clear_worker
+from tasks.history_writer import history_writer
+from tasks.news_counters import reconcile_news_counters, NEWS_COUNTS_RECONCILE_INTERVAL
+from tasks.news_related import refresh_related_news, RELATED_NEWS_REFRESH_INTERVAL
+from tasks.news_trending import decay_trending_news, TRENDING_DECAY_INTERVAL
+from tasks.news_views import flush_buffered_news_views, VIEWS_FLUSH_INTERVAL
+from tasks.runner import run_periodic
 from utils.exception_handlers import register_exception_handlers
+from utils.metrics import MetricsMiddleware, render_metrics
+
+BACKGROUND_SHUTDOWN_TIMEOUT = 5   # 退出时等待后台任务取消的最长时间(秒)，超时也继续写回缓冲数据
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 后台任务：本地缓存失效订阅、浏览量定时写回、分类计数校准、相关新闻榜单刷新、热度榜衰减、浏览历史批量写入、
+    # 清空浏览历史/收藏后的分批删除、列表页访问统计合并与衰减
+    background_tasks = [
+        asyncio.create_task(run_invalidation_listener()),
+        asyncio.create_task(run_periodic("news_views",VIEWS_FLUSH_INTERVAL,flush_buffered_news_views)),
+        asyncio.create_task(run_periodic("news_counts",NEWS_COUNTS_RECONCILE_INTERVAL,reconcile_news_counters)),
+        asyncio.create_task(run_periodic("news_related",RELATED_NEWS_REFRESH_INTERVAL,refresh_related_news)),
+        asyncio.create_task(run_periodic("news_trending",TRENDING_DECAY_INTERVAL,decay_trending_news)),
+        asyncio.create_task(history_writer.run()),
+        asyncio.create_task(run_data_clear_worker()),
+        asyncio.create_task(run_periodic("news_access",NEWS_ACCESS_FLUSH_INTERVAL,flush_news_list_access)),
+        asyncio.create_task(run_periodic("news_access_decay",NEWS_ACCESS_DECAY_INTERVAL,decay_news_access)),
+        # 启动预热：分类和访问最多的列表页，完成后 /ready 才返回 200
+        asyncio.create_task(run_cache_warmer()),
+    ]
+    if read_engine is not None:
+        # 配置了只读副本时定期检测复制延迟，延迟过大或不可用时读请求回退主库
+        await check_replica_lag()
+        background_tasks.append(asyncio.create_task(
+            run_periodic("replica_lag",REPLICA_LAG_CHECK_INTERVAL,check_replica_lag)))
+    yield
+    for task in background_tasks:
+        task.cancel()
+    # 订阅连接关闭时可能卡住(例如预热发布失效通知的同时取消订阅)，限时等待，不能挡住下面的写回
+    await asyncio.wait(background_tasks,timeout=BACKGROUND_SHUTDOWN_TIMEOUT)
+    # 退出前把缓冲中的浏览量、浏览历史写回数据库
+    for drain in (flush_buffered_news_views,history_writer.close,flush_news_list_access):
+        try:
+            await drain()
+        except Exception as e:
+            print(e)
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 register_exception_handlers(app)
 
@@ -15,11 +70,26 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# 每个请求的 SQL 条数/耗时、连接池等待、缓存命中，按路由汇总到 /metrics
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
 
+@app.get("/ready",include_in_schema=False)
+async def ready():
+    # 就绪检查：缓存预热完成前返回 503，负载均衡等它就绪后再转发流量
+    if not WARMUP_STATS["ready"]:
+        return JSONResponse({"status":"warming"},status_code=503)
+    return {"status":"ready",**WARMUP_STATS}
+
+@app.get("/metrics",include_in_schema=False)
+async def metrics():
+    # Prometheus 文本格式
+    return PlainTextResponse(render_metrics(),media_type="text/plain; version=0.0.4")
+
 app.include_router(news.router)
 app.include_router(users.router)
-app.include_router(favorite.router)
\ No newline at end of file
+app.include_router(favorite.router)
+app.include_router(history.router)
\ No newline at end of file
@@ -1,10 +1,11 @@
 from datetime import datetime
 
-from sqlalchemy import UniqueConstraint, Index, Integer, ForeignKey, DateTime
+from sqlalchemy import UniqueConstraint, Index, Integer, ForeignKey
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 from models.news import News
 from models.users import User
+from utils.sql import DateTimeMicro
 
 
 class Base(DeclarativeBase):
@@ -23,12 +24,13 @@ class Favorite(Base):
         UniqueConstraint('user_id', 'news_id', name='user_news_unique'),
         Index('fk_favorite_user_idx', 'user_id'),
         Index('fk_favorite_news_idx', 'news_id'),
+        Index('idx_favorite_user_created_at_id', 'user_id', 'created_at', 'id'),  # 收藏列表游标分页
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True, comment="收藏ID")
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey(User.id), nullable=False, comment="用户ID")
     news_id: Mapped[int] = mapped_column(Integer, ForeignKey(News.id), nullable=False, comment="新闻ID")
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False, comment="收藏时间")
+    created_at: Mapped[datetime] = mapped_column(DateTimeMicro, default=datetime.utcnow, nullable=False, comment="收藏时间")
 
     def __repr__(self):
         return f"<Favorite(id={self.id}, user_id={self.user_id}, news_id={self.news_id}, created_at={self.created_at})>"
\ No newline at end of file
@@ -1,8 +1,9 @@
 from sqlalchemy.orm import Mapped, mapped_column, DeclarativeBase
-from sqlalchemy import Integer, DateTime, ForeignKey, Index
+from sqlalchemy import Integer, ForeignKey, Index, UniqueConstraint
 from datetime import datetime
 from .users import User
 from .news import News
+from utils.sql import DateTimeMicro
 
 
 class Base(DeclarativeBase):
@@ -16,16 +17,19 @@ class History(Base):
     __tablename__ = 'history'
 
     # 创建索引
+    # UniqueConstraint: 同一用户同一新闻只保留一条记录，批量写入依赖它做 upsert
     __table_args__ = (
+        UniqueConstraint('user_id', 'news_id', name='user_news_history_unique'),
         Index('fk_history_user_idx', 'user_id'),
         Index('fk_history_news_idx', 'news_id'),
         Index('idx_view_time', 'view_time'),
+        Index('idx_history_user_view_time_id', 'user_id', 'view_time', 'id'),  # 历史列表游标分页
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True, comment="历史ID")
     user_id: Mapped[int] = mapped_column(Integer, ForeignKey(User.id), nullable=False, comment="用户ID")
     news_id: Mapped[int] = mapped_column(Integer, ForeignKey(News.id), nullable=False, comment="新闻ID")
-    view_time: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, nullable=False, comment="浏览时间")
+    view_time: Mapped[datetime] = mapped_column(DateTimeMicro, default=datetime.now, nullable=False, comment="浏览时间")
 
     def __repr__(self):
         return f"<History(id={self.id}, user_id={self.user_id}, news_id={self.news_id}, view_time={self.view_time})>"
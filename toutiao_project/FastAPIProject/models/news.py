@@ -31,7 +31,12 @@ class News(Base):
     # 创建索引：提升查询速度 → 添加目录
     __table_args__ = (
         Index('fk_news_category_idx', 'category_id'),  # 高频查询场景
-        Index('idx_publish_time', 'publish_time')  # 按发布时间排序
+        Index('idx_publish_time', 'publish_time'),  # 按发布时间排序
+        Index('idx_category_publish_time_id', 'category_id', 'publish_time', 'id'),  # 分类列表游标分页
+        Index('idx_category_views', 'category_id', 'views', 'publish_time'),  # 相关新闻按浏览量排序
+        # 全文搜索：ngram 分词支持中文，只在 MySQL 上创建(需要 5.7.6+)
+        Index('ft_news_title_description_content', 'title', 'description', 'content',
+              mysql_prefix='FULLTEXT', mysql_with_parser='ngram').ddl_if(dialect='mysql'),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True, comment="新闻ID")
@@ -45,6 +50,17 @@ class News(Base):
     publish_time: Mapped[datetime] = mapped_column(DateTime, default=datetime.now, comment="发布时间")
 
 
+class NewsCategoryCounter(Base):
+    """
+    分类新闻数计数表，新增/删除新闻时同步维护，定时任务按 COUNT(*) 校准
+    """
+    __tablename__ = "news_category_counter"
+
+    category_id: Mapped[int] = mapped_column(Integer, ForeignKey('news_category.id'), primary_key=True, comment="分类ID")
+    news_count: Mapped[int] = mapped_column(Integer, default=0, nullable=False, comment="新闻数")
+
+
+
 def __repr__(self):
     return f"<Category(id={self.id},name={self.name},sort_order={self.sort_order})>"
 
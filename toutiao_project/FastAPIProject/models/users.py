@@ -1,9 +1,11 @@
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import Index, Integer, String, Enum, DateTime, ForeignKey
+from sqlalchemy import Index, Integer, String, Enum, DateTime, ForeignKey, Boolean
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
+from utils.sql import DateTimeMicro
+
 
 class Base(DeclarativeBase):
     pass
@@ -58,3 +60,26 @@ class UserToken(Base):
 
     def __repr__(self):
         return f"<UserToken(id={self.id}, user_id={self.user_id}, token='{self.token}')>"
+
+
+class UserDataClearMark(Base):
+    """
+    清空浏览历史/收藏的标记表ORM模型
+    早于 cleared_before 的记录在读取时立即隐藏，由后台任务分批删除，删完后 purged 置为 True
+    """
+    __tablename__ = 'user_data_clear_mark'
+
+    # 创建索引
+    __table_args__ = (
+        Index('idx_clear_mark_purged', 'purged'),
+    )
+
+    user_id: Mapped[int] = mapped_column(Integer, ForeignKey(User.id), primary_key=True, comment="用户ID")
+    kind: Mapped[str] = mapped_column(Enum('history', 'favorite'), primary_key=True, comment="清空的数据类型")
+    cleared_before: Mapped[datetime] = mapped_column(DateTimeMicro, nullable=False,
+                                                     comment="清空时间，不晚于它的记录视为已删除")
+    purged: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False, comment="是否已经删除完毕")
+
+    def __repr__(self):
+        return (f"<UserDataClearMark(user_id={self.user_id}, kind='{self.kind}', "
+                f"cleared_before={self.cleared_before}, purged={self.purged})>")
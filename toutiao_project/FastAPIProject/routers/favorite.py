@@ -1,21 +1,32 @@
+from typing import Optional
+
 from fastapi import APIRouter, Query, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from models.users import User
-from config.db_conf import get_db
-from schemas.favorite import FavoriteCheckResponse, FavoriteAddRequest, FavoriteListResponse
+from config.db_conf import get_db, get_read_db, get_readonly_db, UnitOfWorkRoute
+from schemas.favorite import FavoriteCheckResponse, FavoriteAddRequest, FavoriteListResponse, \
+    FavoriteBatchCheckResponse
 from utils.auth import get_current_user
 from crud import favorite
 from utils.response import success_response
+from utils.pagination import next_cursor
 
-router = APIRouter(prefix="/api/favorite",tags=["favorite"])
+router = APIRouter(prefix="/api/favorite",tags=["favorite"],route_class=UnitOfWorkRoute)
 
 @router.get("/check")
 async def check_favorite(news_id:int=Query(...,alias="newsId"),
                          user:User=Depends(get_current_user),
-                         db:AsyncSession=Depends(get_db)):
+                         db:AsyncSession=Depends(get_readonly_db)):
     is_favorite = await favorite.is_news_favorite(db,user.id,news_id)
     return success_response(message="成功",data=FavoriteCheckResponse(isFavorite=is_favorite))
 
+@router.get("/check/batch")
+async def check_favorite_batch(news_ids:list[int]=Query(...,alias="newsIds",max_length=100),
+                               user:User=Depends(get_current_user),
+                               db:AsyncSession=Depends(get_readonly_db)):
+    flags = await favorite.get_favorite_flags(db,user.id,list(dict.fromkeys(news_ids)))
+    return success_response(message="成功",data=FavoriteBatchCheckResponse(favorites=flags))
+
 @router.post("/add")
 async def add_favorite(
         data:FavoriteAddRequest,
@@ -41,17 +52,22 @@ async def remove_favorite(
 async def get_favorite_list(
         page:int = Query(1,ge=1),
         page_size:int = Query(10,ge=1,le=100,alias="pageSize"),
+        cursor:Optional[str] = None,
         user:User=Depends(get_current_user),
-        db:AsyncSession=Depends(get_db)
+        db:AsyncSession=Depends(get_read_db)
 ):
-    rows,total = await favorite.get_favorite_list(db,user.id,page,page_size)
+    if cursor:
+        rows,total,has_more = await favorite.get_favorite_list_by_cursor(db,user.id,cursor,page_size)
+    else:
+        rows,total = await favorite.get_favorite_list(db,user.id,page,page_size)
+        has_more = total>page*page_size
     favorite_list=[{
         **news.__dict__,
         "favorite_time":favorite_time,
         "favorite_id":favorite_id
     } for news,favorite_time,favorite_id in rows]
-    has_more = total>page*page_size
-    data = FavoriteListResponse(list=favorite_list,total=total,hasMore=has_more)
+    cursor_value = next_cursor(rows[-1].favorite_time,rows[-1].favorite_id,has_more) if rows else None
+    data = FavoriteListResponse(list=favorite_list,total=total,hasMore=has_more,nextCursor=cursor_value)
     return success_response(message="成功",data=data)
 
 @router.delete("/clear")
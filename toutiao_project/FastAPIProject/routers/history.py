@@ -1,39 +1,47 @@
+from datetime import datetime
+from typing import Optional
+
 from fastapi import APIRouter, Depends, Query, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
-from config.db_conf import get_db
+from config.db_conf import get_db, get_read_db, UnitOfWorkRoute
 from crud import history
 from models.users import User
 from schemas.history import HistoryAddRequest, HistoryNewsItemResponse, HistoryListResponse
+from tasks.history_writer import history_writer
 from utils.auth import get_current_user
+from utils.pagination import next_cursor
 from utils.response import success_response
 
-router = APIRouter(prefix="/api/history", tags=["history"])
+router = APIRouter(prefix="/api/history", tags=["history"], route_class=UnitOfWorkRoute)
 
 
 @router.post("/add")
 async def add_history(data: HistoryAddRequest,
-                      user: User = Depends(get_current_user),
-                      db: AsyncSession = Depends(get_db)):
+                      user: User = Depends(get_current_user)):
     """
-    添加历史记录
+    添加历史记录：写入缓冲后立即返回，由后台批量落库
     """
-    result = await history.add_history(db, user.id, data.news_id)
-    return success_response(message="添加成功", data=result)
+    view_time = datetime.now()
+    await history_writer.add(user.id, data.news_id, view_time)
+    return success_response(message="添加成功", data={"user_id": user.id, "news_id": data.news_id, "view_time": view_time})
 
 
 @router.get("/list")
 async def get_history_list(page: int = Query(1, ge=1),
                            page_size: int = Query(10, ge=1, le=100, alias="pageSize"),
+                           cursor: Optional[str] = None,
                            user: User = Depends(get_current_user),
-                           db: AsyncSession = Depends(get_db)):
+                           db: AsyncSession = Depends(get_read_db)):
     """
-    获取历史记录列表
+    获取历史记录列表，传 cursor 时走游标分页
     """
-    rows, total = await history.get_history_list(db, user.id, page, page_size)
-
-    has_more = total > page * page_size
+    if cursor:
+        rows, total, has_more = await history.get_history_list_by_cursor(db, user.id, cursor, page_size)
+    else:
+        rows, total = await history.get_history_list(db, user.id, page, page_size)
+        has_more = total > page * page_size
 
     history_list = [HistoryNewsItemResponse.model_validate({
         **news.__dict__,
@@ -41,7 +49,8 @@ async def get_history_list(page: int = Query(1, ge=1),
         "history_id": history_id
     }) for news, view_time, history_id in rows]
 
-    data = HistoryListResponse(list=history_list, total=total, hasMore=has_more)
+    cursor_value = next_cursor(rows[-1].view_time, rows[-1].history_id, has_more) if rows else None
+    data = HistoryListResponse(list=history_list, total=total, hasMore=has_more, nextCursor=cursor_value)
 
     return success_response(data=data)
 
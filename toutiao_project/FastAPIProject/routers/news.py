@@ -1,14 +1,20 @@
+from typing import Optional
+
 from fastapi import APIRouter,Depends,Query,HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
-from config.db_conf import get_db
+from config.db_conf import get_read_db
 
-from crud import news
+from crud import news, recommend
+from models.users import User
+from utils.auth import get_current_user
+from utils.pagination import next_cursor
+from utils.response import raw_success_response
 
 
 router = APIRouter(prefix="/api/news", tags=["news"])
 
 @router.get("/categories")
-async def get_categories(skip: int = 0, limit: int = 100,db:AsyncSession = Depends(get_db)):
+async def get_categories(skip: int = 0, limit: int = 100,db:AsyncSession = Depends(get_read_db)):
 
     categories= await news.get_categories(db,skip,limit)
     return {
@@ -23,32 +29,95 @@ async def get_news_list(
         category_id : int = Query(..., alias="categoryId"),
         page : int = 1,
         page_size : int =Query(10,alias="pageSize",le=100),
-        db: AsyncSession = Depends(get_db),
+        cursor : Optional[str] = None,
+        db: AsyncSession = Depends(get_read_db),
 ):
-    offset = (page-1)*page_size
-    news_list=await news.get_news_list(db,category_id,offset,page_size)
+    # 传了 cursor 走游标分页，否则保留 page 分页兼容旧客户端
+    if not cursor:
+        # 缓存中的列表页已经是 data 的 JSON，只把 total 拼进去直接返回
+        page_json,total = await news.get_news_page(db,category_id,(page-1)*page_size,page_size)
+        return raw_success_response("获取新闻列表成功",page_json,total=total)
+
+    news_list,has_more = await news.get_news_list_by_cursor(db,category_id,cursor,page_size)
     total= await news.get_news_count(db,category_id)
-    has_more = (offset + page_size) < total
+    last = news_list[-1] if news_list else None
     return {
         "code": 200,
         "message": "获取新闻列表成功",
         "data" :{
             "list" : news_list,
             "total" : total,
-            "hasMore" : has_more
+            "hasMore" : has_more,
+            "nextCursor" : next_cursor(last.publish_time,last.id,has_more) if last else None
+        }
+    }
+
+
+@router.get("/search")
+async def search_news(
+        keyword : str = Query(...,alias="q",min_length=news.SEARCH_MIN_KEYWORD_LENGTH,
+                              max_length=news.SEARCH_MAX_KEYWORD_LENGTH),
+        category_id : Optional[int] = Query(None,alias="categoryId"),
+        page_size : int = Query(10,alias="pageSize",ge=1,le=50),
+        cursor : Optional[str] = None,
+        db: AsyncSession = Depends(get_read_db),
+):
+    keyword = keyword.strip()
+    if len(keyword) < news.SEARCH_MIN_KEYWORD_LENGTH:
+        raise HTTPException(status_code=400,detail="搜索关键词太短")
+    rows,has_more = await news.search_news(db,keyword,category_id,cursor,page_size)
+    last = rows[-1] if rows else None
+    return {
+        "code": 200,
+        "message": "搜索成功",
+        "data": {
+            "list": [item for item,_ in rows],
+            "hasMore": has_more,
+            "nextCursor": next_cursor(last.score,last[0].id,has_more) if last else None
+        }
+    }
+
+
+@router.get("/hot")
+async def get_hot_news(
+        category_id : Optional[int] = Query(None,alias="categoryId"),
+        limit : int = Query(10,ge=1,le=news.HOT_NEWS_MAX_LIMIT),
+):
+    # 不传 categoryId 为全站热榜
+    hot_news = await news.get_hot_news(category_id,limit)
+    return {
+        "code": 200,
+        "message": "success",
+        "data": {
+            "list": hot_news
+        }
+    }
+
+
+@router.get("/recommend")
+async def get_recommended_news(
+        limit : int = Query(10,ge=1,le=recommend.RECOMMEND_MAX_LIMIT),
+        user: User = Depends(get_current_user),
+        db: AsyncSession = Depends(get_read_db),
+):
+    recommended_news = await recommend.get_recommended_news(db,user.id,limit)
+    return {
+        "code": 200,
+        "message": "success",
+        "data": {
+            "list": recommended_news
         }
     }
 
 
 @router.get("/detail")
-async def get_news_detail(news_id:int=Query(...,alias="id"),db:AsyncSession = Depends(get_db)):
+async def get_news_detail(news_id:int=Query(...,alias="id"),db:AsyncSession = Depends(get_read_db)):
     news_detail = await news.get_news_detail(db,news_id)
     if not news_detail:
         raise HTTPException(status_code=404,detail="新闻不存在")
 
-    views_res = await news.increase_news_views(db,news_detail.id)
-    if not views_res:
-        raise HTTPException(status_code=404,detail="新闻不存在")
+    buffered_views = await news.increase_news_views(db,news_detail.id)
+    await news.record_news_view(news_detail.id,news_detail.category_id)
 
     related_news = await news.get_related_news(db,news_detail.id,news_detail.category_id)
 
@@ -63,7 +132,7 @@ async def get_news_detail(news_id:int=Query(...,alias="id"),db:AsyncSession = De
     "author": news_detail.author,
     "publishTime": news_detail.publish_time,
     "categoryId": news_detail.category_id,
-    "views": news_detail.views,
+    "views": news_detail.views + buffered_views,
     "relatedNews": related_news
   }
 }
\ No newline at end of file
@@ -1,13 +1,13 @@
-from fastapi import APIRouter,Depends,HTTPException,status
+from fastapi import APIRouter,Depends,HTTPException,status,Header
 from sqlalchemy.ext.asyncio import AsyncSession
-from config.db_conf import get_db
+from config.db_conf import get_db, UnitOfWorkRoute
 from schemas.users import UserRequest, UserAuthResponse, UserInfoResponse, UserUpdateRequest, UserChangerPasswordRequest
 from crud import users
 from utils.response import success_response
 from utils.auth import get_current_user
 from models.users import User
 
-router = APIRouter(prefix="/api/user", tags=["users"])
+router = APIRouter(prefix="/api/user", tags=["users"], route_class=UnitOfWorkRoute)
 
 @router.post("/register")
 async def register(user_data:UserRequest,db:AsyncSession=Depends(get_db)):
@@ -31,6 +31,14 @@ async def login(user_data:UserRequest,db:AsyncSession=Depends(get_db)):
   return success_response(message="登陆成功",data=response_data)
 
 
+@router.post("/logout")
+async def logout(authorization:str=Header(...,alias="Authorization"),
+                 user:User=Depends(get_current_user),
+                 db:AsyncSession=Depends(get_db)):
+  await users.delete_token(db,authorization.replace("Bearer ",""))
+  return success_response(message="退出成功")
+
+
 @router.get("/info")
 async def get_user_info(user:User=Depends(get_current_user)):
   return success_response(message="获取信息成功",data=UserInfoResponse.model_validate(user))
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -9,6 +9,9 @@ from schemas.base import NewsItemBase
 class FavoriteCheckResponse(BaseModel):
     is_favorite: bool=Field(...,alias="isFavorite")
 
+class FavoriteBatchCheckResponse(BaseModel):
+    favorites: dict[int,bool]
+
 class FavoriteAddRequest(BaseModel):
     news_id: int = Field(...,alias="newsId")
 
@@ -25,6 +28,7 @@ class FavoriteListResponse(BaseModel):
     list: list[FavoriteNewsItemResponse]
     total:int
     has_more: bool=Field(alias="hasMore")
+    next_cursor: Optional[str]=Field(None,alias="nextCursor")
 
     model_config = ConfigDict(
         populate_by_name=  True,
@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 
 from pydantic import BaseModel, Field, ConfigDict
 
@@ -28,6 +29,7 @@ class HistoryListResponse(BaseModel):
     list: list[HistoryNewsItemResponse]
     total: int
     has_more: bool = Field(alias="hasMore")
+    next_cursor: Optional[str] = Field(None, alias="nextCursor")
 
     model_config = ConfigDict(
         populate_by_name=True,
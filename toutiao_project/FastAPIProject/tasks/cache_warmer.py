@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+from cache.news_access import get_hottest_news_lists, decay_news_list_access, NEWS_ACCESS_HALF_LIFE
+from config.cache_config import acquire_lock, release_lock
+from config.db_conf import AsyncSessionLocal
+from crud.news import get_categories, get_news_page
+
+WARM_TOP_K = 50                   # 预热访问最多的前 K 个列表页
+WARM_CONCURRENCY = 4              # 同时回源的数量上限
+WARM_RATE = 20                    # 每秒最多发起的回源数，避免启动时压垮数据库
+WARM_TIMEOUT = 30                 # 预热最长时间(秒)，超时后也视为就绪，不阻塞发布
+WARM_DEFAULT_PAGE_SIZE = 10       # 没有访问统计时(例如 Redis 数据丢失)预热每个分类的第一页
+
+NEWS_ACCESS_FLUSH_INTERVAL = 10   # 进程内访问次数合并到 Redis 的间隔(秒)
+NEWS_ACCESS_DECAY_INTERVAL = 600  # 访问统计衰减间隔(秒)
+NEWS_ACCESS_DECAY_LOCK_KEY = "lock:news:access:decay"
+NEWS_ACCESS_DECAY_LOCK_TTL_MS = 60000
+
+# 预热状态：ready 为 True 后 /ready 才返回 200
+WARMUP_STATS = {
+    "ready": False,
+    "warmed": 0,
+    "failures": 0,
+    "duration": 0.0,
+}
+
+
+class RateLimiter:
+    """
+    按固定间隔放行：每次调用最早在上一次放行 1/rate 秒之后返回
+    """
+
+    def __init__(self,rate:float):
+        self._interval = 1 / rate
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next_at - now
+            self._next_at = max(now,self._next_at) + self._interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def warm_caches():
+    """
+    预热分类列表和访问最多的列表页(含分类总数)，并发数和回源速率都有上限
+    已在缓存中的页直接命中，多个worker同时预热时由单飞锁保证只回源一次
+    """
+    async with AsyncSessionLocal() as session:
+        categories = await get_categories(session)
+
+    targets = await get_hottest_news_lists(WARM_TOP_K)
+    if not targets:
+        targets = [(category["id"],1,WARM_DEFAULT_PAGE_SIZE) for category in categories][:WARM_TOP_K]
+
+    semaphore = asyncio.Semaphore(WARM_CONCURRENCY)
+    limiter = RateLimiter(WARM_RATE)
+
+    async def warm(category_id:int,page:int,size:int):
+        async with semaphore:
+            await limiter.wait()
+            try:
+                async with AsyncSessionLocal() as session:
+                    await get_news_page(session,category_id,(page-1)*size,size,record_access=False)
+                WARMUP_STATS["warmed"] += 1
+            except Exception as e:
+                WARMUP_STATS["failures"] += 1
+                print(f"[cache_warmer] {category_id}:{page}:{size} {e}")
+
+    await asyncio.gather(*[warm(*target) for target in targets])
+
+
+async def run_cache_warmer():
+    """
+    启动时在后台执行一次预热，结束(或超时、失败)后标记就绪
+    """
+    start = time.monotonic()
+    try:
+        await asyncio.wait_for(warm_caches(),WARM_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"[cache_warmer] 预热超过 {WARM_TIMEOUT}s，跳过剩余部分")
+    except Exception as e:
+        print(f"[cache_warmer] {e}")
+    finally:
+        WARMUP_STATS["duration"] = round(time.monotonic() - start,3)
+        WARMUP_STATS["ready"] = True
+
+
+async def decay_news_access():
+    """
+    按半衰期衰减列表页访问统计，让预热目标跟随近期流量；同一时刻只允许一个worker执行
+    """
+    token = await acquire_lock(NEWS_ACCESS_DECAY_LOCK_KEY,NEWS_ACCESS_DECAY_LOCK_TTL_MS)
+    if token is None:
+        return
+    try:
+        await decay_news_list_access(0.5 ** (NEWS_ACCESS_DECAY_INTERVAL / NEWS_ACCESS_HALF_LIFE))
+    finally:
+        await release_lock(NEWS_ACCESS_DECAY_LOCK_KEY,token)
@@ -0,0 +1,59 @@
+import asyncio
+
+from config.cache_config import acquire_lock, release_lock
+from config.db_conf import AsyncSessionLocal
+from crud.clear import clear_requested, get_pending_clear_marks, purge_cleared_batch, finish_clear_mark
+
+CLEAR_BATCH_SIZE = 1000          # 每个事务最多删除的行数
+CLEAR_BATCH_PAUSE = 0.05         # 批次之间的间隔(秒)，把行锁和 IO 让给在线写入
+CLEAR_POLL_INTERVAL = 30         # 没有收到通知时也定期检查，处理其他进程登记的清空
+CLEAR_PENDING_LIMIT = 100
+CLEAR_LOCK_TTL_MS = 600000
+
+
+async def purge_cleared_data():
+    """
+    按清空标记分批删除浏览历史/收藏，每批单独提交；同一用户同一类型同一时刻只由一个worker处理
+    返回本次删除的行数
+    """
+    async with AsyncSessionLocal() as session:
+        marks = await get_pending_clear_marks(session,CLEAR_PENDING_LIMIT)
+    purged = 0
+    for user_id,kind,cleared_before in marks:
+        lock_key = f"lock:clear:{kind}:{user_id}"
+        token = await acquire_lock(lock_key,CLEAR_LOCK_TTL_MS)
+        if token is None:
+            continue
+        try:
+            while True:
+                async with AsyncSessionLocal() as session:
+                    scanned, deleted = await purge_cleared_batch(session,user_id,kind,cleared_before,
+                                                                 CLEAR_BATCH_SIZE)
+                    if scanned < CLEAR_BATCH_SIZE:
+                        await finish_clear_mark(session,user_id,kind,cleared_before)
+                    await session.commit()
+                purged += deleted
+                if scanned < CLEAR_BATCH_SIZE:
+                    break
+                await asyncio.sleep(CLEAR_BATCH_PAUSE)
+        finally:
+            await release_lock(lock_key,token)
+    if len(marks) >= CLEAR_PENDING_LIMIT:
+        # 还有未处理的标记，不等下一轮轮询
+        clear_requested.set()
+    return purged
+
+
+async def run_data_clear_worker():
+    while True:
+        try:
+            await asyncio.wait_for(clear_requested.wait(),CLEAR_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        clear_requested.clear()
+        try:
+            await purge_cleared_data()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[data_clear] {e}")
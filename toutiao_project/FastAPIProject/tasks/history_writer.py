@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, Tuple
+
+from config.db_conf import AsyncSessionLocal, commit_unit_of_work
+from crud.history import add_history_batch
+
+HISTORY_FLUSH_INTERVAL = 1.0     # 浏览记录最长缓冲时间(秒)
+HISTORY_BATCH_SIZE = 500         # 攒够这么多条立即写入
+HISTORY_MAX_PENDING = 20000      # 缓冲上限，超过后由写入方同步等待刷写(背压)
+
+
+class HistoryWriter:
+    """
+    浏览历史批量写入器：接口只把 (user_id, news_id) -> view_time 放进内存缓冲，
+    后台按时间或数量批量 INSERT ... ON DUPLICATE KEY UPDATE，同一用户重复浏览同一新闻只保留最新时间
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple[int,int],datetime] = {}
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+    async def add(self,user_id:int,news_id:int,view_time:datetime):
+        if len(self._pending) >= HISTORY_MAX_PENDING:
+            await self.flush()
+        self._pending[(user_id,news_id)] = view_time
+        if len(self._pending) >= HISTORY_BATCH_SIZE:
+            self._wakeup.set()
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            rows = [{"user_id":user_id,"news_id":news_id,"view_time":view_time}
+                    for (user_id,news_id),view_time in pending.items()]
+            try:
+                async with AsyncSessionLocal() as session:
+                    for start in range(0,len(rows),HISTORY_BATCH_SIZE):
+                        await add_history_batch(session,rows[start:start+HISTORY_BATCH_SIZE])
+                    # 提交后再把新记录写入 Redis 中的最近浏览列表
+                    await commit_unit_of_work(session)
+            except BaseException:
+                # 写入失败(或退出时被取消)放回缓冲等待下次重试/close 写入，期间产生的更新时间更新
+                # 提交后才被取消时会重复写入一次，upsert 只更新浏览时间，结果不变
+                for key,view_time in pending.items():
+                    if key not in self._pending:
+                        self._pending[key] = view_time
+                raise
+            return len(rows)
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(),HISTORY_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[history_writer] {e}")
+
+    async def close(self):
+        """
+        应用退出前把缓冲中的记录全部写入
+        """
+        await self.flush()
+
+
+history_writer = HistoryWriter()
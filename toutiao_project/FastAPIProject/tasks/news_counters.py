@@ -0,0 +1,25 @@
+from cache.news_cache import set_cache_news_count
+from config.cache_config import acquire_lock, release_lock
+from config.db_conf import AsyncSessionLocal
+from crud.news import reconcile_news_counts
+
+NEWS_COUNTS_RECONCILE_INTERVAL = 600     # 分类计数校准间隔(秒)
+NEWS_COUNTS_LOCK_KEY = "lock:news:counts:reconcile"
+NEWS_COUNTS_LOCK_TTL_MS = 60000
+
+
+async def reconcile_news_counters():
+    """
+    按 COUNT(*) 校准计数表并刷新 Redis 中的分类计数，同一时刻只允许一个worker执行
+    """
+    token = await acquire_lock(NEWS_COUNTS_LOCK_KEY,NEWS_COUNTS_LOCK_TTL_MS)
+    if token is None:
+        return
+    try:
+        async with AsyncSessionLocal() as session:
+            counts = await reconcile_news_counts(session)
+            await session.commit()
+        for category_id,count in counts.items():
+            await set_cache_news_count(category_id,count)
+    finally:
+        await release_lock(NEWS_COUNTS_LOCK_KEY,token)
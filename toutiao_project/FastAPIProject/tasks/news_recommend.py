@@ -0,0 +1,290 @@
+"""
+离线计算"读过这篇的人也读了"：用浏览历史和收藏构建新闻-新闻共现矩阵，为每篇新闻保存相似度最高的 K 篇到 Redis
+
+相似度为余弦相似度 cooccurrence(i,j) / sqrt(count(i) * count(j))，count 为读过该新闻的用户数
+共现矩阵和计数保存在本地状态文件中，每天增量运行：先按天数衰减旧值，只加入上次运行之后有新行为的用户带来的共现，
+再只重写相似度发生变化的新闻；--full 丢弃状态文件全量重建
+"新行为"按浏览历史/收藏的主键水位判断：行为时间由应用写入，晚提交的行可能带着更早的时间，按时间水位会被永久漏掉；
+重复浏览只更新原有记录的浏览时间、不产生新的新闻对，按主键判断不会漏掉共现
+限制：自增主键按分配顺序而不是提交顺序递增，读取水位时还未提交、但主键更小的行会被漏掉(直到 --full 重建)；
+只有和本任务读取水位同时提交的少量行受影响，建议定期(例如每周)执行一次 --full 补齐
+按用户分块读取和计算，内存占用只与共现矩阵的非零元素数和单块大小有关
+
+依赖(只有这个任务需要)：numpy、scipy
+运行(在 FastAPIProject 目录下，例如每天由 cron 调度)：
+    python -m tasks.news_recommend
+    python -m tasks.news_recommend --full
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select, func, union
+
+from cache.recommend_cache import set_similar_news_many, clear_similar_news
+from config.cache_config import acquire_lock, release_lock
+from config.db_conf import AsyncSessionLocal
+from models.favorite import Favorite
+from models.history import History
+from models.news import News
+
+RECOMMEND_STATE_PATH = os.getenv("RECOMMEND_STATE_PATH", "recommend_state.npz")
+RECOMMEND_TOP_K = 20
+RECOMMEND_CHUNK_USERS = 5000            # 每块处理的用户数
+RECOMMEND_MAX_ITEMS_PER_USER = 200      # 每个用户只取最近的这么多条，避免重度用户产生平方级的共现
+RECOMMEND_DAILY_DECAY = 0.98            # 旧共现每天乘以这个系数，逐渐淡出
+RECOMMEND_MIN_COOCCURRENCE = 0.5        # 衰减后低于这个值的共现删除，控制矩阵规模
+RECOMMEND_MIN_SUPPORT = 2               # 读者少于这个数的新闻不参与相似度计算(噪声大)
+RECOMMEND_WRITE_BATCH = 1000
+RECOMMEND_LOCK_KEY = "lock:news:recommend"
+RECOMMEND_LOCK_TTL_MS = 6 * 3600 * 1000
+
+
+class RecommendState:
+    """
+    增量计算需要保留的状态：共现矩阵、每篇新闻的读者数，以及已处理到的历史/收藏主键(没有处理过时为 None)
+    """
+
+    def __init__(self, cooccurrence: sparse.csr_matrix, counts: np.ndarray,
+                 history_watermark: Optional[int], favorite_watermark: Optional[int],
+                 updated_at: float):
+        self.cooccurrence = cooccurrence
+        self.counts = counts
+        self.history_watermark = history_watermark
+        self.favorite_watermark = favorite_watermark
+        self.updated_at = updated_at
+
+    @classmethod
+    def empty(cls, dim: int):
+        return cls(sparse.csr_matrix((dim, dim), dtype=np.float32), np.zeros(dim, dtype=np.float32), None, None,
+                   time.time())
+
+    @classmethod
+    def load(cls, path: str):
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            if not np.issubdtype(data["history_watermark"].dtype, np.integer):
+                # 旧版本按时间记录水位的状态文件，无法换算成主键，全量重建
+                print(f"{path} 为旧版本状态文件，全量重建")
+                return None
+            shape = tuple(data["shape"])
+            cooccurrence = sparse.csr_matrix((data["data"], data["indices"], data["indptr"]), shape=shape)
+            return cls(cooccurrence, data["counts"], _parse_watermark(data["history_watermark"]),
+                       _parse_watermark(data["favorite_watermark"]), float(data["updated_at"]))
+
+    def save(self, path: str):
+        # 先写临时文件再改名，任务中途失败不会留下损坏的状态
+        tmp_path = path + ".tmp.npz"
+        np.savez_compressed(
+            tmp_path,
+            data=self.cooccurrence.data, indices=self.cooccurrence.indices, indptr=self.cooccurrence.indptr,
+            shape=np.array(self.cooccurrence.shape), counts=self.counts,
+            history_watermark=np.array(_format_watermark(self.history_watermark), dtype=np.int64),
+            favorite_watermark=np.array(_format_watermark(self.favorite_watermark), dtype=np.int64),
+            updated_at=np.array(self.updated_at),
+        )
+        os.replace(tmp_path, path)
+
+    def resize(self, dim: int):
+        if dim <= self.counts.shape[0]:
+            return
+        self.cooccurrence.resize((dim, dim))
+        self.counts = np.pad(self.counts, (0, dim - self.counts.shape[0]))
+
+
+def _format_watermark(value: Optional[int]) -> int:
+    return -1 if value is None else value
+
+
+def _parse_watermark(value: np.ndarray) -> Optional[int]:
+    value = int(value)
+    return None if value < 0 else value
+
+
+async def _active_user_ids(session, history_since, favorite_since) -> List[int]:
+    """
+    上次运行之后有新浏览或新收藏的用户；全量重建时为所有有行为的用户
+    """
+    history_query = select(History.user_id)
+    if history_since is not None:
+        history_query = history_query.where(History.id > history_since)
+    favorite_query = select(Favorite.user_id)
+    if favorite_since is not None:
+        favorite_query = favorite_query.where(Favorite.id > favorite_since)
+    result = await session.execute(union(history_query, favorite_query))
+    return sorted(result.scalars().all())
+
+
+async def _load_interactions(session, user_ids, history_until, favorite_until,
+                             history_since, favorite_since) -> Dict[int, List[Tuple[int, bool]]]:
+    """
+    读取一块用户截至本次水位的全部行为，返回 user_id -> [(news_id, 是否为上次运行之后的新行为)]
+    新旧按主键水位判断，远近仍按行为时间排序；同一篇新闻浏览和收藏合并为一条；每个用户只保留最近 RECOMMEND_MAX_ITEMS_PER_USER 条
+    """
+    latest: Dict[Tuple[int, int], Tuple[datetime, bool]] = {}
+
+    def merge(user_id, news_id, happened_at, is_new):
+        key = (user_id, news_id)
+        previous = latest.get(key)
+        if previous is None:
+            latest[key] = (happened_at, is_new)
+        else:
+            # 浏览和收藏中任何一条在以前的运行中处理过，这对(用户, 新闻)的共现就已经计入，不再算新行为
+            latest[key] = (max(previous[0], happened_at), previous[1] and is_new)
+
+    stmt = select(History.id, History.user_id, History.news_id, History.view_time).where(
+        History.user_id.in_(user_ids), History.id <= history_until)
+    for row_id, user_id, news_id, view_time in (await session.execute(stmt)).all():
+        merge(user_id, news_id, view_time, history_since is None or row_id > history_since)
+    if favorite_until is not None:
+        stmt = select(Favorite.id, Favorite.user_id, Favorite.news_id, Favorite.created_at).where(
+            Favorite.user_id.in_(user_ids), Favorite.id <= favorite_until)
+        for row_id, user_id, news_id, created_at in (await session.execute(stmt)).all():
+            merge(user_id, news_id, created_at, favorite_since is None or row_id > favorite_since)
+
+    by_user: Dict[int, List[Tuple[datetime, int, bool]]] = defaultdict(list)
+    for (user_id, news_id), (happened_at, is_new) in latest.items():
+        by_user[user_id].append((happened_at, news_id, is_new))
+    interactions = {}
+    for user_id, items in by_user.items():
+        items.sort(reverse=True)
+        interactions[user_id] = [(news_id, is_new) for _, news_id, is_new in items[:RECOMMEND_MAX_ITEMS_PER_USER]]
+    return interactions
+
+
+def _chunk_delta(interactions: Dict[int, List[Tuple[int, bool]]], dim: int):
+    """
+    A 为用户-新闻矩阵(全部行为)，N 只含新行为；新增共现 = NᵀA + AᵀN - NᵀN
+    即至少一端是新行为的新闻对，两端都是旧行为的共现在以前的运行中已经计入
+    """
+    rows, cols, new_rows, new_cols = [], [], [], []
+    for row, items in enumerate(interactions.values()):
+        for news_id, is_new in items:
+            rows.append(row)
+            cols.append(news_id)
+            if is_new:
+                new_rows.append(row)
+                new_cols.append(news_id)
+    shape = (len(interactions), dim)
+    a = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape)
+    n = sparse.csr_matrix((np.ones(len(new_rows), dtype=np.float32), (new_rows, new_cols)), shape=shape)
+    delta = (n.T @ a) + (a.T @ n) - (n.T @ n)
+    return delta.tocsr(), np.asarray(n.sum(axis=0)).ravel()
+
+
+def top_neighbours(state: RecommendState, news_ids, top_k: int = RECOMMEND_TOP_K) -> Dict[int, List[Tuple[int, float]]]:
+    """
+    逐行计算余弦相似度并取前 top_k
+    """
+    matrix = state.cooccurrence
+    counts = state.counts
+    norms = np.sqrt(counts)
+    neighbours = {}
+    for news_id in news_ids:
+        if counts[news_id] < RECOMMEND_MIN_SUPPORT:
+            continue
+        start, end = matrix.indptr[news_id], matrix.indptr[news_id + 1]
+        cols = matrix.indices[start:end]
+        mask = counts[cols] >= RECOMMEND_MIN_SUPPORT
+        cols = cols[mask]
+        if cols.size == 0:
+            continue
+        sims = matrix.data[start:end][mask] / (norms[news_id] * norms[cols])
+        if cols.size > top_k:
+            top = np.argpartition(-sims, top_k)[:top_k]
+            cols, sims = cols[top], sims[top]
+        order = np.argsort(-sims)
+        neighbours[int(news_id)] = [(int(cols[i]), float(sims[i])) for i in order]
+    return neighbours
+
+
+async def build_recommendations(full: bool = False, state_path: str = RECOMMEND_STATE_PATH,
+                                chunk_users: int = RECOMMEND_CHUNK_USERS, top_k: int = RECOMMEND_TOP_K):
+    """
+    执行一次(增量或全量)计算，返回统计信息
+    """
+    start = time.monotonic()
+    state = None if full else RecommendState.load(state_path)
+    async with AsyncSessionLocal() as session:
+        max_news_id = (await session.execute(select(func.max(News.id)))).scalar_one() or 0
+        history_until = (await session.execute(select(func.max(History.id)))).scalar_one()
+        favorite_until = (await session.execute(select(func.max(Favorite.id)))).scalar_one()
+        dim = max_news_id + 1
+        if state is None:
+            state = RecommendState.empty(dim)
+        else:
+            state.resize(dim)
+        history_since, favorite_since = state.history_watermark, state.favorite_watermark
+        if history_until is None:
+            history_until = history_since or 0
+
+        user_ids = await _active_user_ids(session, history_since, favorite_since)
+        delta = sparse.csr_matrix((dim, dim), dtype=np.float32)
+        delta_counts = np.zeros(dim, dtype=np.float32)
+        for offset in range(0, len(user_ids), chunk_users):
+            interactions = await _load_interactions(session, user_ids[offset:offset + chunk_users], history_until,
+                                                    favorite_until, history_since, favorite_since)
+            chunk_delta, chunk_counts = _chunk_delta(interactions, dim)
+            delta = delta + chunk_delta
+            delta_counts += chunk_counts
+
+    # 旧值按经过的天数衰减后再加上本次新增，去掉对角线和过小的共现
+    decay = RECOMMEND_DAILY_DECAY ** ((time.time() - state.updated_at) / 86400)
+    cooccurrence = (state.cooccurrence * decay + delta).tocsr()
+    cooccurrence.setdiag(0)
+    cooccurrence.data[cooccurrence.data < RECOMMEND_MIN_COOCCURRENCE] = 0
+    cooccurrence.eliminate_zeros()
+    state.cooccurrence = cooccurrence.astype(np.float32)
+    state.counts = (state.counts * decay + delta_counts).astype(np.float32)
+    state.history_watermark = history_until
+    state.favorite_watermark = favorite_until or favorite_since
+    state.updated_at = time.time()
+
+    # 全量时先删掉旧结果再重写所有新闻；增量时只重写有新增共现的新闻
+    source = state.cooccurrence if full else delta
+    changed = np.flatnonzero(np.diff(source.indptr))
+    neighbours = top_neighbours(state, changed, top_k)
+    items = list(neighbours.items())
+    if full:
+        await clear_similar_news()
+    for offset in range(0, len(items), RECOMMEND_WRITE_BATCH):
+        await set_similar_news_many(dict(items[offset:offset + RECOMMEND_WRITE_BATCH]))
+    state.save(state_path)
+    return {
+        "mode": "full" if full else "incremental",
+        "users": len(user_ids),
+        "news_written": len(neighbours),
+        "nnz": int(state.cooccurrence.nnz),
+        "seconds": round(time.monotonic() - start, 2),
+    }
+
+
+async def run(args):
+    token = await acquire_lock(RECOMMEND_LOCK_KEY, RECOMMEND_LOCK_TTL_MS)
+    if token is None:
+        print("另一个推荐计算任务正在运行")
+        return
+    try:
+        print(await build_recommendations(args.full, args.state_path, args.chunk_users, args.top_k))
+    finally:
+        await release_lock(RECOMMEND_LOCK_KEY, token)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="离线计算相似新闻")
+    parser.add_argument("--full", action="store_true", help="丢弃状态文件全量重建")
+    parser.add_argument("--state-path", default=RECOMMEND_STATE_PATH)
+    parser.add_argument("--chunk-users", type=int, default=RECOMMEND_CHUNK_USERS)
+    parser.add_argument("--top-k", type=int, default=RECOMMEND_TOP_K)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
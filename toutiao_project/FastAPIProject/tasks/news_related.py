@@ -0,0 +1,61 @@
+import time
+
+from sqlalchemy import select
+
+from cache.news_cache import set_cache_related_news_many
+from config.cache_config import acquire_lock, release_lock
+from config.db_conf import AsyncSessionLocal
+from crud.news import load_related_candidates, RELATED_NEWS_LIMIT
+from models.news import Category
+from utils.metrics import RELATED_NEWS_REFRESH_RUNS, RELATED_NEWS_REFRESH_FAILURES, RELATED_NEWS_REFRESH_DURATION, \
+    RELATED_NEWS_STALENESS, register_collector
+
+RELATED_NEWS_REFRESH_INTERVAL = 300    # 刷新间隔(秒)，需明显小于 RELATED_NEWS_MAX_STALENESS
+RELATED_NEWS_LOCK_KEY = "lock:news:related:refresh"
+RELATED_NEWS_LOCK_TTL_MS = 120000
+
+# 刷新指标：执行/失败次数、最近一次耗时与完成时间、刷新的分类数
+RELATED_NEWS_REFRESH_STATS = {
+    "runs": 0,
+    "failures": 0,
+    "last_duration": 0.0,
+    "last_refreshed_at": None,
+    "categories": 0,
+}
+
+
+@register_collector
+def _collect_refresh_stats():
+    RELATED_NEWS_REFRESH_RUNS.set(RELATED_NEWS_REFRESH_STATS["runs"])
+    RELATED_NEWS_REFRESH_FAILURES.set(RELATED_NEWS_REFRESH_STATS["failures"])
+    RELATED_NEWS_REFRESH_DURATION.set(RELATED_NEWS_REFRESH_STATS["last_duration"])
+    last_refreshed_at = RELATED_NEWS_REFRESH_STATS["last_refreshed_at"]
+    RELATED_NEWS_STALENESS.set(time.time() - last_refreshed_at if last_refreshed_at else -1)
+
+
+async def refresh_related_news():
+    """
+    为每个分类预先计算按浏览量排序的前 N+1 条新闻，详情页直接读取并过滤当前新闻
+    同一时刻只允许一个worker刷新
+    """
+    token = await acquire_lock(RELATED_NEWS_LOCK_KEY,RELATED_NEWS_LOCK_TTL_MS)
+    if token is None:
+        return
+    start = time.monotonic()
+    RELATED_NEWS_REFRESH_STATS["runs"] += 1
+    try:
+        async with AsyncSessionLocal() as session:
+            result = await session.execute(select(Category.id))
+            category_ids = result.scalars().all()
+            items_by_category = {}
+            for category_id in category_ids:
+                items_by_category[category_id] = await load_related_candidates(session,category_id,RELATED_NEWS_LIMIT + 1)
+        await set_cache_related_news_many(items_by_category)
+        RELATED_NEWS_REFRESH_STATS["categories"] = len(category_ids)
+        RELATED_NEWS_REFRESH_STATS["last_refreshed_at"] = time.time()
+    except Exception:
+        RELATED_NEWS_REFRESH_STATS["failures"] += 1
+        raise
+    finally:
+        RELATED_NEWS_REFRESH_STATS["last_duration"] = time.monotonic() - start
+        await release_lock(RELATED_NEWS_LOCK_KEY,token)
@@ -0,0 +1,22 @@
+from cache.trending_cache import scan_trending_boards, decay_trending_board, TRENDING_HALF_LIFE
+from config.cache_config import acquire_lock, release_lock
+
+TRENDING_DECAY_INTERVAL = 600     # 衰减间隔(秒)
+TRENDING_LOCK_KEY = "lock:news:trending:decay"
+TRENDING_LOCK_TTL_MS = 60000
+
+
+async def decay_trending_news():
+    """
+    按半衰期对所有热度榜做一次指数衰减并裁剪，同一时刻只允许一个worker执行
+    每次乘以 0.5 ** (间隔 / 半衰期)，热度每过一个半衰期减半
+    """
+    token = await acquire_lock(TRENDING_LOCK_KEY,TRENDING_LOCK_TTL_MS)
+    if token is None:
+        return
+    try:
+        factor = 0.5 ** (TRENDING_DECAY_INTERVAL / TRENDING_HALF_LIFE)
+        for key in await scan_trending_boards():
+            await decay_trending_board(key,factor)
+    finally:
+        await release_lock(TRENDING_LOCK_KEY,token)
@@ -0,0 +1,32 @@
+from cache.news_views import take_buffered_news_views, ack_buffered_news_views
+from config.cache_config import acquire_lock, release_lock
+from config.db_conf import AsyncSessionLocal, after_commit, commit_unit_of_work
+from crud.news import flush_news_views
+
+VIEWS_FLUSH_INTERVAL = 5          # 浏览量写回间隔(秒)
+VIEWS_FLUSH_LOCK_KEY = "lock:news:views:flush"
+VIEWS_FLUSH_LOCK_TTL_MS = 30000   # 同一时刻只允许一个worker写回
+
+
+async def flush_buffered_news_views():
+    """
+    把 Redis 中累计的浏览量增量批量写回数据库，返回本次写回的浏览次数
+    提交成功后才确认批次；若提交后、确认前进程退出，该批次会被重复写回一次
+    详情页显示的浏览量 = 数据库 + 累加中 + 写回中，提交后写回批次已经体现在数据库里，
+    所以确认放在提交回调中紧跟提交执行，尽量缩短这段重复计算的窗口
+    """
+    token = await acquire_lock(VIEWS_FLUSH_LOCK_KEY,VIEWS_FLUSH_LOCK_TTL_MS)
+    if token is None:
+        return 0
+    try:
+        deltas = await take_buffered_news_views()
+        if deltas:
+            async with AsyncSessionLocal() as session:
+                await flush_news_views(session,deltas)
+                after_commit(session,ack_buffered_news_views)
+                await commit_unit_of_work(session)
+        else:
+            await ack_buffered_news_views()
+        return sum(deltas.values())
+    finally:
+        await release_lock(VIEWS_FLUSH_LOCK_KEY,token)
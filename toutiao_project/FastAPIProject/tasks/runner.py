@@ -0,0 +1,16 @@
+import asyncio
+from typing import Awaitable, Callable
+
+
+async def run_periodic(name:str,interval:float,job:Callable[[],Awaitable]):
+    """
+    每隔 interval 秒执行一次 job，单次失败只打印错误，不影响后续执行
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[{name}] {e}")
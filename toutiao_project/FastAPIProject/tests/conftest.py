@@ -0,0 +1,73 @@
+"""
+测试环境：和 benchmarks/load_test.py 一样，数据库指向临时 sqlite(aiosqlite)，Redis 客户端换成 fakeredis
+其他模块通过 from config.cache_config import redis_client 取客户端，必须在导入任何应用模块之前替换
+
+依赖(只在测试时需要)：pytest、anyio、aiosqlite、fakeredis(+lupa，执行 Lua 脚本)；推荐任务的测试还需要 numpy、scipy
+运行(在 FastAPIProject 目录下)：
+    python -m pytest -q tests
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_DB_PATH = os.path.join(tempfile.mkdtemp(prefix="toutiao-test-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_DB_PATH}"
+os.environ["DB_ECHO"] = "false"
+os.environ.pop("READ_DATABASE_URL", None)
+
+import fakeredis
+import pytest
+
+from config import cache_config
+
+_server = fakeredis.FakeServer()
+cache_config.redis_client = fakeredis.FakeAsyncRedis(server=_server, decode_responses=True)
+cache_config.redis_binary_client = fakeredis.FakeAsyncRedis(server=_server, decode_responses=False)
+
+from config.db_conf import async_engine
+from config.local_cache import local_cache
+from models import news as news_models, users as users_models, history as history_models, \
+    favorite as favorite_models
+
+_MODELS = (news_models, users_models, history_models, favorite_models)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db_setup(anyio_backend):
+    """
+    每个测试使用空表和空 Redis；结束时释放连接池，连接不跨测试的事件循环复用
+    """
+    async with async_engine.begin() as conn:
+        for module in _MODELS:
+            await conn.run_sync(module.Base.metadata.drop_all)
+        for module in reversed(_MODELS):
+            await conn.run_sync(module.Base.metadata.create_all)
+    await cache_config.redis_client.flushall()
+    local_cache.clear()
+    yield
+    await async_engine.dispose()
+
+
+@pytest.fixture
+async def seed_users(db_setup):
+    """
+    3 个用户、10 篇新闻(同一分类)，返回用户ID列表
+    """
+    from config.db_conf import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        session.add(news_models.Category(id=1, name="分类1", sort_order=1))
+        await session.flush()
+        for i in range(1, 11):
+            session.add(news_models.News(id=i, title=f"新闻{i}", content="正文", category_id=1))
+        for i in range(1, 4):
+            session.add(users_models.User(id=i, username=f"user{i}", password="x"))
+        await session.commit()
+    return [1, 2, 3]
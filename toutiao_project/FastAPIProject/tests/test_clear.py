@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+import tasks.data_clear as data_clear
+from config.db_conf import AsyncSessionLocal, commit_unit_of_work
+from crud.clear import mark_cleared, purge_cleared_batch, get_pending_clear_marks
+from models.history import History
+from models.users import UserDataClearMark
+
+pytestmark = pytest.mark.anyio
+
+
+async def _seed_history(user_id: int, news_ids, view_time: datetime):
+    async with AsyncSessionLocal() as session:
+        session.add_all([History(user_id=user_id, news_id=news_id, view_time=view_time) for news_id in news_ids])
+        await session.commit()
+
+
+async def _mark(user_id: int, kind: str = "history"):
+    async with AsyncSessionLocal() as session:
+        cleared_before = await mark_cleared(session, user_id, kind)
+        await commit_unit_of_work(session)
+    return cleared_before
+
+
+async def _history_news_ids(user_id: int):
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(History.news_id).where(History.user_id == user_id)
+                                       .order_by(History.news_id))
+        return result.scalars().all()
+
+
+async def test_purge_deletes_only_rows_before_mark(seed_users):
+    await _seed_history(1, [1, 2, 3], datetime.now() - timedelta(hours=1))
+    await _seed_history(2, [1], datetime.now() - timedelta(hours=1))
+    cleared_before = await _mark(1)
+    await _seed_history(1, [4], datetime.now())
+
+    async with AsyncSessionLocal() as session:
+        assert await purge_cleared_batch(session, 1, "history", cleared_before, 2) == (2, 2)
+        assert await purge_cleared_batch(session, 1, "history", cleared_before, 2) == (1, 1)
+        assert await purge_cleared_batch(session, 1, "history", cleared_before, 2) == (0, 0)
+        await session.commit()
+    assert await _history_news_ids(1) == [4]
+    assert await _history_news_ids(2) == [1]
+
+
+class _ReviewAfterSelect:
+    """
+    包一层会话：取出待删主键之后、执行删除之前，把一条记录的浏览时间更新到清空之后(模拟重新浏览)
+    """
+
+    def __init__(self, session, news_id: int):
+        self._session = session
+        self._news_id = news_id
+        self._calls = 0
+
+    async def execute(self, stmt):
+        result = await self._session.execute(stmt)
+        self._calls += 1
+        if self._calls == 1:
+            await self._session.execute(update(History).where(History.news_id == self._news_id)
+                                        .values(view_time=datetime.now()))
+        return result
+
+
+async def test_purge_keeps_row_reviewed_after_select(seed_users):
+    await _seed_history(1, [1, 2], datetime.now() - timedelta(hours=1))
+    cleared_before = await _mark(1)
+
+    async with AsyncSessionLocal() as session:
+        scanned, deleted = await purge_cleared_batch(_ReviewAfterSelect(session, 2), 1, "history",
+                                                     cleared_before, 10)
+        await session.commit()
+    assert (scanned, deleted) == (2, 1)
+    assert await _history_news_ids(1) == [2]
+
+
+async def test_worker_purges_in_batches_and_finishes_mark(seed_users, monkeypatch):
+    monkeypatch.setattr(data_clear, "CLEAR_BATCH_SIZE", 2)
+    monkeypatch.setattr(data_clear, "CLEAR_BATCH_PAUSE", 0)
+    await _seed_history(1, [1, 2, 3, 4, 5], datetime.now() - timedelta(hours=1))
+    await _mark(1)
+
+    assert await data_clear.purge_cleared_data() == 5
+    assert await _history_news_ids(1) == []
+    async with AsyncSessionLocal() as session:
+        assert await get_pending_clear_marks(session) == []
+        purged = (await session.execute(select(UserDataClearMark.purged))).scalars().all()
+    assert purged == [True]
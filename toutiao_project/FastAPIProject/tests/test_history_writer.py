@@ -0,0 +1,80 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+import tasks.history_writer as history_writer_module
+from cache.history_cache import get_cached_history_page
+from config.db_conf import AsyncSessionLocal, commit_unit_of_work
+from crud.history import clear_history, get_history_list
+from models.history import History
+from tasks.history_writer import HistoryWriter
+
+pytestmark = pytest.mark.anyio
+
+
+async def _history_rows():
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(History.user_id, History.news_id).order_by(History.news_id))
+        return result.all()
+
+
+async def test_flush_writes_batch(seed_users):
+    writer = HistoryWriter()
+    now = datetime.now()
+    await writer.add(1, 1, now)
+    await writer.add(1, 2, now)
+    await writer.add(1, 1, now + timedelta(seconds=1))
+
+    assert await writer.flush() == 2
+    assert await _history_rows() == [(1, 1), (1, 2)]
+
+
+async def test_cancelled_flush_keeps_batch_for_close(seed_users, monkeypatch):
+    """
+    退出时 run() 被取消、再调用 close()：取消落在刷写中途时，这一批要放回缓冲，由 close() 写入
+    """
+    writer = HistoryWriter()
+    await writer.add(1, 1, datetime.now())
+    await writer.add(2, 3, datetime.now())
+
+    started, release = asyncio.Event(), asyncio.Event()
+    original_add_history_batch = history_writer_module.add_history_batch
+
+    async def blocked_add_history_batch(db, rows):
+        started.set()
+        await release.wait()
+        await original_add_history_batch(db, rows)
+
+    monkeypatch.setattr(history_writer_module, "add_history_batch", blocked_add_history_batch)
+    flush_task = asyncio.create_task(writer.flush())
+    await started.wait()
+    flush_task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await flush_task
+    assert await _history_rows() == []
+
+    monkeypatch.setattr(history_writer_module, "add_history_batch", original_add_history_batch)
+    await writer.close()
+    assert await _history_rows() == [(1, 1), (2, 3)]
+
+
+async def test_view_buffered_before_clear_stays_hidden(seed_users):
+    """
+    清空前产生、清空后才刷写的浏览记录不能出现在列表里，也不能被加回最近浏览缓存
+    """
+    writer = HistoryWriter()
+    await writer.add(1, 4, datetime.now())
+    async with AsyncSessionLocal() as session:
+        await clear_history(session, 1)
+        await commit_unit_of_work(session)
+    await writer.flush()
+    await writer.add(1, 5, datetime.now())
+    await writer.flush()
+
+    assert await get_cached_history_page(1, 0, 9) == ([5], 1)
+    async with AsyncSessionLocal() as session:
+        rows, total = await get_history_list(session, 1)
+    assert [row.News.id for row in rows] == [5]
+    assert total == 1
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+from cache.recommend_cache import get_similar_news_many
+from config.cache_config import redis_client
+from config.db_conf import AsyncSessionLocal
+from models.favorite import Favorite
+from models.history import History
+from tasks.news_recommend import RecommendState, build_recommendations
+
+pytestmark = pytest.mark.anyio
+
+
+async def _add(*rows):
+    async with AsyncSessionLocal() as session:
+        session.add_all(rows)
+        await session.commit()
+
+
+def _assert_same_state(incremental: RecommendState, full: RecommendState):
+    # 两次运行之间只隔几秒，衰减系数近似为 1
+    assert np.allclose(incremental.cooccurrence.toarray(), full.cooccurrence.toarray(), rtol=1e-4)
+    assert np.allclose(incremental.counts, full.counts, rtol=1e-4)
+
+
+async def test_incremental_matches_full_rebuild(seed_users, tmp_path):
+    now = datetime.now()
+    await _add(*[History(user_id=user_id, news_id=news_id, view_time=now - timedelta(hours=news_id))
+                 for user_id in (1, 2, 3) for news_id in (1, 2, 3)])
+    incremental_path, full_path = str(tmp_path / "incremental.npz"), str(tmp_path / "full.npz")
+    await build_recommendations(True, incremental_path)
+
+    # 收藏已经浏览过的新闻(不是新的新闻对)、新浏览一篇，以及提交较晚但浏览时间更早的记录
+    await _add(Favorite(user_id=1, news_id=2), History(user_id=1, news_id=4, view_time=now))
+    await _add(History(user_id=2, news_id=5, view_time=now - timedelta(days=3)))
+    stats = await build_recommendations(False, incremental_path)
+    assert stats["users"] == 2
+
+    await build_recommendations(True, full_path)
+    incremental, full = RecommendState.load(incremental_path), RecommendState.load(full_path)
+    _assert_same_state(incremental, full)
+    assert incremental.history_watermark == full.history_watermark
+    assert incremental.favorite_watermark == full.favorite_watermark
+
+
+async def test_incremental_without_new_rows_changes_nothing(seed_users, tmp_path):
+    now = datetime.now()
+    await _add(*[History(user_id=user_id, news_id=news_id, view_time=now)
+                 for user_id in (1, 2) for news_id in (1, 2)])
+    path = str(tmp_path / "state.npz")
+    await build_recommendations(True, path)
+    before = RecommendState.load(path)
+
+    stats = await build_recommendations(False, path)
+    assert stats["users"] == 0
+    assert stats["news_written"] == 0
+    _assert_same_state(RecommendState.load(path), before)
+
+
+async def test_full_rebuild_drops_stale_similar_news(seed_users, tmp_path):
+    await redis_client.set("news:similar:9", "[[1, 0.5]]")
+    now = datetime.now()
+    await _add(*[History(user_id=user_id, news_id=news_id, view_time=now)
+                 for user_id in (1, 2) for news_id in (1, 2)])
+
+    await build_recommendations(True, str(tmp_path / "state.npz"))
+    similar = await get_similar_news_many([1, 2, 9])
+    assert [news_id for news_id, _ in similar[1]] == [2]
+    assert 9 not in similar
@@ -1,12 +1,15 @@
 from fastapi import Header, HTTPException
 from fastapi.params import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from config.db_conf import get_db
+from config.db_conf import get_readonly_db
 from crud import users
 from starlette import status
 
 
-async def get_current_user(authorization:str = Header(...,alias="Authorization"),db:AsyncSession=Depends(get_db)):
+async def get_current_user(authorization:str = Header(...,alias="Authorization"),
+                           db:AsyncSession=Depends(get_readonly_db)):
+    # 只读取令牌和用户，使用主库只读会话：不开事务也不提交；不用副本，刚登录的令牌可能还没复制过去
+    # 需要修改用户的接口(更新资料、修改密码)在自己的 get_db 会话中重新加载用户
     token = authorization.replace("Bearer ","")
     user = await users.get_user_by_token(db,token)
     if not user:
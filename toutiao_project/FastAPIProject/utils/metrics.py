@@ -0,0 +1,231 @@
+import bisect
+import contextvars
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 秒级耗时的桶，覆盖 1ms ~ 10s
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 单个请求内次数的桶(SQL 条数、缓存命中数)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """
+    Prometheus 风格的累计直方图，按标签值分组；只在事件循环线程里更新，不加锁
+    """
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        # 标签值 -> (各桶计数(非累计), 总和, 总数)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values: str):
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, (counts, total, count) in sorted(self._series.items()):
+            labels = [f'{name}="{value}"' for name, value in zip(self.label_names, label_values)]
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = ",".join(labels + [f'le="{le}"'])
+                lines.append(f"{self.name}_bucket{{{bucket_labels}}} {cumulative}")
+            suffix = f"{{{','.join(labels)}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, *label_values: str):
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def set(self, value: float, *label_values: str):
+        # 由采集回调写入其他模块自己维护的累计值
+        self._values[label_values] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            labels = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, label_values))
+            lines.append(f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}")
+        return lines
+
+
+class Gauge:
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, *label_values: str):
+        self._values[label_values] = value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        for label_values, value in sorted(self._values.items()):
+            labels = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, label_values))
+            lines.append(f"{self.name}{{{labels}}} {value}" if labels else f"{self.name} {value}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram("http_request_duration_seconds", "请求耗时", ("method", "route", "status"))
+REQUEST_DB_QUERIES = Histogram("http_request_db_queries", "单个请求执行的 SQL 条数", ("route",), COUNT_BUCKETS)
+REQUEST_DB_SECONDS = Histogram("http_request_db_seconds", "单个请求的 SQL 总耗时", ("route",))
+REQUEST_POOL_WAIT_SECONDS = Histogram("http_request_pool_wait_seconds", "单个请求等待连接池的总耗时", ("route",))
+REQUEST_CACHE_SECONDS = Histogram("http_request_cache_seconds", "单个请求访问 Redis 的总耗时", ("route",))
+REQUEST_CACHE_HITS = Histogram("http_request_cache_hits", "单个请求的缓存命中数", ("route",), COUNT_BUCKETS)
+REQUEST_CACHE_MISSES = Histogram("http_request_cache_misses", "单个请求的缓存未命中数", ("route",), COUNT_BUCKETS)
+DB_QUERY_SECONDS = Histogram("db_query_duration_seconds", "单条 SQL 耗时(含后台任务)", ("engine",))
+DB_POOL_WAIT_SECONDS = Histogram("db_pool_wait_seconds", "从连接池取连接的等待时间(含后台任务)", ("engine",))
+DB_POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "已借出的连接数", ("engine",))
+DB_POOL_OVERFLOW = Gauge("db_pool_overflow", "超出 pool_size 的连接数(为负表示池未建满)", ("engine",))
+DB_POOL_SIZE = Gauge("db_pool_size", "连接池常驻连接数上限", ("engine",))
+DB_REPLICA_LAG_SECONDS = Gauge("db_replica_lag_seconds", "只读副本复制延迟，-1 表示不可用")
+DB_SLOW_QUERIES = Counter("db_slow_queries_total", "超过慢查询阈值的 SQL 条数(不受采样影响)")
+CACHE_LOOKUPS = Counter("cache_lookups_total", "缓存读取次数", ("tier", "result"))
+LOCAL_CACHE_LOOKUPS = Counter("local_cache_lookups_total", "进程内缓存(L1)查找次数，只统计登记过规则的 key", ("result",))
+LOCAL_CACHE_EVICTIONS = Counter("local_cache_evictions_total", "进程内缓存因容量上限淘汰的条目数")
+LOCAL_CACHE_ENTRIES = Gauge("local_cache_entries", "进程内缓存当前条目数")
+LOCAL_CACHE_BYTES = Gauge("local_cache_bytes", "进程内缓存当前占用(估算字节数)")
+LOCAL_CACHE_CAPACITY_BYTES = Gauge("local_cache_max_bytes", "进程内缓存占用上限")
+TOKEN_CACHE_LOOKUPS = Counter("token_cache_lookups_total", "令牌解析缓存读取次数", ("result",))
+TOKEN_CACHE_HIT_RATE = Gauge("token_cache_hit_rate", "令牌解析缓存命中率(进程启动以来)")
+RELATED_NEWS_REFRESH_RUNS = Counter("related_news_refresh_runs_total", "相关新闻榜单刷新次数(本进程)")
+RELATED_NEWS_REFRESH_FAILURES = Counter("related_news_refresh_failures_total", "相关新闻榜单刷新失败次数(本进程)")
+RELATED_NEWS_REFRESH_DURATION = Gauge("related_news_refresh_last_duration_seconds", "最近一次相关新闻榜单刷新耗时")
+RELATED_NEWS_STALENESS = Gauge("related_news_staleness_seconds", "距本进程最近一次成功刷新的时间，-1 表示尚未刷新")
+HASH_QUEUE_SECONDS = Histogram("password_hash_queue_seconds", "密码哈希在线程池前排队的时间")
+HASH_RUN_SECONDS = Histogram("password_hash_run_seconds", "单次密码哈希/校验的计算时间")
+HASH_WAITING = Gauge("password_hash_waiting", "正在排队等待计算的密码哈希数")
+HASH_WORKERS = Gauge("password_hash_workers", "同时计算的密码哈希上限")
+
+METRICS = (REQUEST_SECONDS, REQUEST_DB_QUERIES, REQUEST_DB_SECONDS, REQUEST_POOL_WAIT_SECONDS, REQUEST_CACHE_SECONDS,
+           REQUEST_CACHE_HITS, REQUEST_CACHE_MISSES, DB_QUERY_SECONDS, DB_POOL_WAIT_SECONDS, DB_POOL_CHECKED_OUT,
+           DB_POOL_OVERFLOW, DB_POOL_SIZE, DB_REPLICA_LAG_SECONDS, DB_SLOW_QUERIES, CACHE_LOOKUPS,
+           LOCAL_CACHE_LOOKUPS, LOCAL_CACHE_EVICTIONS, LOCAL_CACHE_ENTRIES, LOCAL_CACHE_BYTES,
+           LOCAL_CACHE_CAPACITY_BYTES, TOKEN_CACHE_LOOKUPS, TOKEN_CACHE_HIT_RATE, RELATED_NEWS_REFRESH_RUNS,
+           RELATED_NEWS_REFRESH_FAILURES, RELATED_NEWS_REFRESH_DURATION, RELATED_NEWS_STALENESS,
+           HASH_QUEUE_SECONDS, HASH_RUN_SECONDS, HASH_WAITING, HASH_WORKERS)
+
+# 渲染前调用的回调，用于采集连接池状态这类只在读取时才有意义的 Gauge
+_collectors: List[Callable[[], None]] = []
+
+
+def register_collector(collector: Callable[[], None]):
+    _collectors.append(collector)
+    return collector
+
+
+@dataclass
+class RequestStats:
+    db_queries: int = 0
+    db_seconds: float = 0.0
+    pool_wait_seconds: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    cache_seconds: float = 0.0
+
+
+# 当前请求的统计，请求之外(后台任务)为 None，只计入全局指标
+_request_stats: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("request_stats", default=None)
+
+
+def record_query(seconds: float, engine: str = "primary"):
+    DB_QUERY_SECONDS.observe(seconds, engine)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_seconds += seconds
+
+
+def record_pool_wait(seconds: float, engine: str = "primary"):
+    DB_POOL_WAIT_SECONDS.observe(seconds, engine)
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.pool_wait_seconds += seconds
+
+
+def record_cache(hits: int = 0, misses: int = 0, seconds: float = 0.0, tier: str = "redis"):
+    """
+    tier: local 为进程内缓存，redis 为 Redis；seconds 只统计访问 Redis 的耗时
+    """
+    if hits:
+        CACHE_LOOKUPS.inc(hits, tier, "hit")
+    if misses:
+        CACHE_LOOKUPS.inc(misses, tier, "miss")
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+        stats.cache_seconds += seconds
+
+
+def render_metrics() -> str:
+    for collector in _collectors:
+        try:
+            collector()
+        except Exception as e:
+            print(e)
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """
+    纯 ASGI 中间件：为每个 HTTP 请求建立统计上下文，结束时按路由模板写入直方图
+    不用 BaseHTTPMiddleware，避免额外的任务和响应体转发开销
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            # 用路由模板而不是原始路径做标签，避免路径参数造成标签爆炸
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], route, str(status_code))
+            REQUEST_DB_QUERIES.observe(stats.db_queries, route)
+            REQUEST_DB_SECONDS.observe(stats.db_seconds, route)
+            REQUEST_POOL_WAIT_SECONDS.observe(stats.pool_wait_seconds, route)
+            REQUEST_CACHE_SECONDS.observe(stats.cache_seconds, route)
+            REQUEST_CACHE_HITS.observe(stats.cache_hits, route)
+            REQUEST_CACHE_MISSES.observe(stats.cache_misses, route)
@@ -0,0 +1,33 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Optional, Tuple, Union
+
+from fastapi import HTTPException
+from starlette import status
+
+
+def encode_cursor(sort_value:Union[datetime,str,float],row_id:int) -> str:
+    """
+    把最后一条记录的 (排序值, id) 编码成不透明的游标字符串
+    排序值一般是时间，缓存中读出的时间已经是 ISO 字符串，直接使用；搜索按相关度分数排序时为浮点数
+    """
+    if isinstance(sort_value,datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value,row_id],separators=(",",":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor:str,parse_sort_value:Callable[[Any],Any]=datetime.fromisoformat) -> Tuple[Any,int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return parse_sort_value(sort_value), int(row_id)
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,detail="无效的游标")
+
+
+def next_cursor(sort_value:Optional[Union[datetime,str,float]],row_id:int,has_more:bool) -> Optional[str]:
+    if not has_more or sort_value is None:
+        return None
+    return encode_cursor(sort_value,row_id)
@@ -1,3 +1,6 @@
+import json
+
+from fastapi import Response
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
 
@@ -7,4 +10,16 @@ def success_response(message:str="success",data=None):
         "message":message,
         "data":data
     }
-    return JSONResponse(content=jsonable_encoder(content))
\ No newline at end of file
+    return JSONResponse(content=jsonable_encoder(content))
+
+def raw_success_response(message:str,data:bytes,**extra):
+    """
+    data 是已经序列化好的 JSON 对象字节(如缓存中的列表页)，原样拼进响应体，不再解析和重新编码
+    extra 中的字段追加到 data 对象里
+    """
+    if extra:
+        fields = ",".join(f"{json.dumps(name)}:{json.dumps(value,ensure_ascii=False)}" for name,value in extra.items())
+        separator = b"," if data.rstrip()[:-1].strip() != b"{" else b""
+        data = data.rstrip()[:-1] + separator + fields.encode() + b"}"
+    head = json.dumps({"code":200,"message":message},ensure_ascii=False,separators=(",",":"))[:-1]
+    return Response(content=head.encode() + b',"data":' + data + b"}",media_type="application/json")
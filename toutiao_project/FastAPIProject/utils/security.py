@@ -1,10 +1,71 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from utils.metrics import HASH_QUEUE_SECONDS, HASH_RUN_SECONDS, HASH_WAITING, HASH_WORKERS, register_collector
+
+# bcrypt 计算成本，调整后旧哈希会在用户下次登录时自动重新计算
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS","12"))
+# 哈希线程池大小(同时计算的上限)，bcrypt 计算期间释放 GIL，不会阻塞事件循环
+HASH_MAX_WORKERS = int(os.getenv("HASH_MAX_WORKERS","4"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+_executor = ThreadPoolExecutor(max_workers=HASH_MAX_WORKERS, thread_name_prefix="bcrypt")
+_semaphore = asyncio.Semaphore(HASH_MAX_WORKERS)
+
+# 哈希任务指标：次数、排队等待时间、计算时间、当前排队数
+HASH_STATS = {
+    "calls": 0,
+    "waiting": 0,
+    "queue_time_total": 0.0,
+    "queue_time_max": 0.0,
+    "run_time_total": 0.0,
+}
+
+
+async def _run_in_pool(func, *args):
+    """
+    在线程池中执行 bcrypt 计算，信号量限制同时计算的数量，超出的请求在事件循环中排队
+    """
+    queued_at = time.monotonic()
+    HASH_STATS["waiting"] += 1
+    async with _semaphore:
+        HASH_STATS["waiting"] -= 1
+        started_at = time.monotonic()
+        queue_time = started_at - queued_at
+        HASH_STATS["calls"] += 1
+        HASH_STATS["queue_time_total"] += queue_time
+        HASH_STATS["queue_time_max"] = max(HASH_STATS["queue_time_max"], queue_time)
+        HASH_QUEUE_SECONDS.observe(queue_time)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+        finally:
+            run_time = time.monotonic() - started_at
+            HASH_STATS["run_time_total"] += run_time
+            HASH_RUN_SECONDS.observe(run_time)
+
+
+@register_collector
+def _collect_hash_stats():
+    HASH_WAITING.set(HASH_STATS["waiting"])
+    HASH_WORKERS.set(HASH_MAX_WORKERS)
+
+
+async def get_hash_password(password: str):
+    return await _run_in_pool(pwd_context.hash, password)
+
 
-def get_hash_password(password: str):
-    return pwd_context.hash(password)
+async def verify_password(plain_password: str, hashed_password: str):
+    return await _run_in_pool(pwd_context.verify, plain_password, hashed_password)
 
 
-def verify_password(plain_password: str, hashed_password: str) :
-    return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+async def verify_and_update_password(plain_password: str, hashed_password: str):
+    """
+    校验密码，同时判断哈希是否需要按当前 bcrypt 参数重新计算
+    返回 (是否通过, 新哈希或None)
+    """
+    return await _run_in_pool(pwd_context.verify_and_update, plain_password, hashed_password)
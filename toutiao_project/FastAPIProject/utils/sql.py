@@ -0,0 +1,21 @@
+from typing import Any, Callable, Dict, List, Sequence, Union
+
+from sqlalchemy import DateTime, Table
+from sqlalchemy.dialects import mysql, sqlite
+
+# 精确到微秒的时间列：MySQL 的 DATETIME 默认不保存小数秒(写入时四舍五入到秒)，
+# 同一秒内先后发生的写入和清空无法按时间区分，需要比较先后的列统一用 DATETIME(6)
+DateTimeMicro = DateTime().with_variant(mysql.DATETIME(fsp=6),"mysql")
+
+
+def upsert(dialect_name:str,table:Table,values:Union[Dict[str,Any],List[Dict[str,Any]]],
+           conflict_columns:Sequence[str],update:Callable[[Any],Dict[str,Any]]):
+    """
+    构造"插入或更新"语句，线上 MySQL 使用 ON DUPLICATE KEY UPDATE，本地/测试的 SQLite 使用 ON CONFLICT DO UPDATE
+    update 接收"新插入的行"(MySQL 的 inserted / SQLite 的 excluded)，返回需要更新的列
+    """
+    if dialect_name == "mysql":
+        stmt = mysql.insert(table).values(values)
+        return stmt.on_duplicate_key_update(**update(stmt.inserted))
+    stmt = sqlite.insert(table).values(values)
+    return stmt.on_conflict_do_update(index_elements=list(conflict_columns),set_=update(stmt.excluded))